@@ -1,8 +1,11 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
+import copy
 from datetime import datetime
+import functools
+import json
 import utils
 import utils_ai
 
@@ -22,10 +25,9 @@ def run_backup_on_startup():
 
 run_backup_on_startup()
 
-# Custom CSS
 # Custom CSS - Slate & Steel Theme
-def apply_custom_styling():
-    st.markdown("""
+# Single stylesheet (theme, nav tiles, dashboard cards, gateway table) emitted once per run
+CUSTOM_CSS = """
     <style>
         /* Global Font & Background */
         .main .block-container { padding-top: 2rem; }
@@ -69,13 +71,262 @@ def apply_custom_styling():
         ::-webkit-scrollbar-thumb { background: #888; }
         ::-webkit-scrollbar-thumb:hover { background: #555; }
 
+        /* Navigation Tiles */
+        div.stButton > button {
+            width: 100%;
+            height: 60px;
+        }
+        div.stButton > button:first-child {
+            width: 100%;
+            height: 3em; 
+            font-weight: bold;
+            border-radius: 10px;
+        }
+
+        /* Dashboard Cards */
+        .dash-card {
+            background-color: #262730; /* Dark card background */
+            border-radius: 12px;
+            padding: 20px;
+            box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.5);
+            position: relative;
+            overflow: hidden;
+            height: 140px;
+            border: 1px solid #3f3f46;
+        }
+        .dash-card::before {
+            content: "";
+            position: absolute;
+            top: -20px;
+            right: -20px;
+            width: 80px;
+            height: 80px;
+            border-radius: 50%;
+            opacity: 0.1; /* Lower opacity for dark mode */
+        }
+        .card-blue::before { background-color: #60a5fa; }
+        .card-green::before { background-color: #34d399; }
+        .card-yellow::before { background-color: #fbbf24; }
+        .card-red::before { background-color: #f87171; }
+        
+        .card-label { font-size: 0.8rem; font-weight: bold; text-transform: uppercase; margin-bottom: 5px; display: flex; align-items: center; gap: 5px; color: #e5e7eb; }
+        .card-value { font-size: 2.5rem; font-weight: 800; color: #f9fafb; line-height: 1; }
+        .card-sub { font-size: 0.8rem; color: #9ca3af; margin-top: 5px; }
+        
+        /* Status Badge CSS (Modern Pastel) */
+        .status-badge {
+            padding: 4px 12px;
+            border-radius: 6px;
+            font-size: 0.8rem;
+            font-weight: 700; /* Bold */
+            display: inline-block;
+            margin-bottom: 2px;
+            border: 1px solid transparent; /* No border needed for pastel usually */
+        }
+        /* Pastel Colors */
+        .bg-green { background-color: #E6F4EA; color: #137333; } /* On Track */
+        .bg-yellow { background-color: #FEF7E0; color: #B06000; } /* At Risk - Darker Orange text for contrast */
+        .bg-red { background-color: #FCE8E6; color: #C5221F; } /* Critical */
+        .bg-grey { background-color: #F3F4F6; color: #4B5563; } /* Pending */
+        
+        .plan-date { font-size: 0.7rem; color: #6b7280; margin-top: 2px; display: block; }
+        
+        /* Table Border Styling for Gateway Status */
+        .gateway-table-cell {
+            border: 1px solid #f3f4f6; /* Very subtle border */
+            padding: 8px;
+            text-align: center;
+            background-color: #ffffff; 
+            color: #1f2937;
+            border-radius: 4px; /* Soft edges */
+        }
+        .gateway-table-header {
+            border-bottom: 2px solid #e5e7eb;
+            padding-bottom: 8px;
+            font-weight: bold;
+            color: #111827; 
+            text-transform: uppercase;
+            font-size: 0.85rem;
+            letter-spacing: 0.05em;
+            text-align: center;
+        }
+        
+        /* Vibrant AI Expander Styling */
+        div[data-testid="stExpander"] details summary p {
+            font-size: 1.2rem;
+            font-weight: 700;
+            color: #4f46e5; /* Indigo */
+        }
+
+        /* Gateway Status Table Layout */
+        .gateway-table {
+            display: grid;
+            grid-template-columns: 1.5fr 0.8fr 1fr 2.5fr 1fr 1fr 1fr 1fr 1fr;
+            column-gap: 1rem;
+            row-gap: 10px;
+        }
+        .gateway-table-sep {
+            grid-column: 1 / -1;
+            border-bottom: 1px solid #f3f4f6;
+        }
+        .gateway-table-cell {
+            padding: 8px;
+            text-align: center;
+            background-color: #ffffff; 
+            color: #1f2937;
+            border-radius: 0px; 
+            margin-bottom: 5px;
+            height: 100%;
+            display: flex;
+            align-items: center;
+            justify-content: center;
+            flex-direction: column;
+        }
+        .gateway-table-header {
+            font-weight: bold;
+            color: #111827; 
+            text-transform: uppercase;
+            font-size: 0.8rem;
+            letter-spacing: 0.05em;
+            text-align: center;
+            border-bottom: 2px solid #e5e7eb;
+            padding-bottom: 8px;
+            margin-bottom: 10px;
+            /* Vertical Grid Line for Header */
+            border-right: 1px solid #e5e7eb;
+            height: 100%;
+            display: flex;
+            align-items: center;
+            justify-content: center;
+        }
+        /* Row Item Styling equivalent to cell for non-badge items */
+        .row-item {
+            text-align: center;
+            height: 100%;
+            display: flex;
+            align-items: center;
+            justify-content: center;
+            border-right: 1px solid #e5e7eb; /* Vertical Grid Line */
+            padding: 0 5px;
+        }
+        
+        .row-container {
+             background-color: white; 
+             border-bottom: 1px solid #f3f4f6; 
+             padding-top: 10px; 
+             padding-bottom: 10px;
+        }
+
+        /* Inline Stacked Bar */
+        .stacked-bar-container {
+            width: 100%;
+            height: 16px;
+            background-color: #e5e7eb;
+            border-radius: 8px;
+            overflow: hidden;
+            display: flex;
+            margin-top: 4px;
+        }
+        .bar-seg { height: 100%; }
+        .bar-green { background-color: #10b981; }
+        .bar-yellow { background-color: #f59e0b; }
+        .bar-red { background-color: #ef4444; }
+
+        /* Deliverables Checklist: Big Table Fonts + Hide Toolbar (scoped to the keyed checklist container) */
+        .st-key-deliv_card div[data-testid="stDataEditor"] table {
+            font-size: 22px !important;
+        }
+        .st-key-deliv_card div[data-testid="stDataEditor"] td {
+            font-size: 22px !important;
+            height: 75px !important; /* Increased Height */
+            padding-top: 15px !important;
+            padding-bottom: 15px !important;
+        }
+        .st-key-deliv_card div[data-testid="stDataEditor"] th {
+            font-size: 22px !important;
+            height: 75px !important; /* Increased Height */
+        }
+        /* Attempts to target internal grid if table css fails */
+        .st-key-deliv_card div[class*="stDataFrame"] {
+            font-size: 22px !important;
+        }
+        /* Hide Streamlit Toolbar (Zoom/Fullscreen) on the checklist editor */
+        .st-key-deliv_card div[data-testid="stElementToolbar"],
+        .st-key-deliv_card button[title="View fullscreen"] {
+            display: none !important;
+        }
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+def apply_custom_styling():
+    st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 apply_custom_styling()
 
+# Gantt segment colors (legend order)
+GANTT_COLORS = {
+    "Plan": "#93c5fd", # Light Blue
+    "Actual (On Track)": "#10b981", # Green
+    "Actual (At Risk)": "#f59e0b", # Amber
+    "Actual (Delay)": "#ff0000" # Bright Red
+}
+
+# Gantt viewport: fixed chart height, rows shown before panning
+GANTT_HEIGHT = 800
+GANTT_VISIBLE_ROWS = 25
+
+# Gantt segment label by utils.classify_status code (grey = no plan, drawn as On Track)
+GANTT_ACTUAL_LABELS = np.array(["Actual (On Track)", "Actual (At Risk)", "Actual (Delay)", "Actual (On Track)"], dtype=object)
+
+# Status -> icon for the Detailed View editor cells
+STATUS_ICONS = { "green": "🟢", "yellow": "🟡", "red": "🔴", "grey": "⚪" }
+
+def empty_gateways():
+    """Blank {gateway: {p, a, ecn}} dict for a new module / sub-module (one comprehension, no per-gateway copies)."""
+    return {gw: {"p": "", "a": "", "ecn": ""} for gw in utils.GATEWAYS}
+
+# Deliverable status <-> editor label (Logic for Colors); built once, not per rerun
+DELIV_STATUS_LABELS = {
+    "Completed": "🟢 Completed",
+    "WIP": "🟡 WIP",
+    "Pending": "🔴 Pending",
+    "NA": "⚪ NA"
+}
+DELIV_STATUS_VALUES = {v: k for k, v in DELIV_STATUS_LABELS.items()}
+
+@functools.lru_cache(maxsize=4096)
+def fmt_month(d):
+    """Formats 'YYYY-MM-DD' as 'Mon-YY' for gateway badges (cached: the same dates repeat across projects)."""
+    if not d: return "Pending"
+    try: return utils.parse_iso(d).strftime("%b-%y")
+    except ValueError: return d
+
+@functools.lru_cache(maxsize=4096)
+def parse_date(d_str):
+    """Parses 'YYYY-MM-DD' for date inputs/rollups; None if blank or invalid (cached, invalid strings included)."""
+    try: return utils.parse_iso(d_str)
+    except ValueError: return None
+
 # --- Data Loading ---
-projects = utils.load_data()
+# The session keeps its own projects between reruns; it is reloaded only when the DB changed underneath it
+def save_projects(data, dirty=None):
+    """
+    utils.save_data() for the session's projects.
+    The stored version is dropped either way, so the next run reloads: re-reading db_version() after the write
+    could pick up another session's commit and pin this session to data that doesn't include it.
+    """
+    saved = utils.save_data(data, dirty)
+    if saved:
+        st.session_state.projects = data
+    st.session_state.pop('projects_version', None)
+    return saved
+
+# Version read before the load: a commit landing in between only makes the next run reload again
+db_version_before_load = utils.db_version()
+if st.session_state.get('projects_version') != db_version_before_load:
+    st.session_state.projects = utils.load_data()
+    st.session_state.projects_version = db_version_before_load
+projects = st.session_state.projects
 
 
 # --- App Header (Centered with Logo) ---
@@ -95,37 +346,24 @@ if 'view' not in st.session_state:
 def set_view(view_name):
     st.session_state.view = view_name
 
-# --- Top Navigation Tiles ---
-st.markdown("""
-<style>
-    div.stButton > button {
-        width: 100%;
-        height: 60px;
-div.stButton > button:first-child {
-    width: 100%;
-    height: 3em; 
-    font-weight: bold;
-    border-radius: 10px;
-}
-</style>
-""", unsafe_allow_html=True)
+def mark_dirty():
+    """Flags in-place edits to `projects`; flushed with a single save_projects() after the render pass."""
+    st.session_state._dirty = True
 
+def sync_selected_types():
+    st.session_state.selected_types = st.session_state.dash_filter_types
+
+# --- Top Navigation Tiles ---
 nav_c1, nav_c2, nav_c3 = st.columns(3)
 
 with nav_c1:
-    if st.button("📊 Dashboard", type="primary" if st.session_state.view == "Dashboard" else "secondary"):
-        set_view("Dashboard")
-        st.rerun()
+    st.button("📊 Dashboard", type="primary" if st.session_state.view == "Dashboard" else "secondary", on_click=set_view, args=("Dashboard",))
 
 with nav_c2:
-    if st.button("🏗️ Detailed Project View", type="primary" if st.session_state.view == "Detailed Project View" else "secondary"):
-        set_view("Detailed Project View")
-        st.rerun()
+    st.button("🏗️ Detailed Project View", type="primary" if st.session_state.view == "Detailed Project View" else "secondary", on_click=set_view, args=("Detailed Project View",))
 
 with nav_c3:
-    if st.button("📋 Deliverables", type="primary" if st.session_state.view == "Deliverables Tracker" else "secondary"):
-        set_view("Deliverables Tracker")
-        st.rerun()
+    st.button("📋 Deliverables", type="primary" if st.session_state.view == "Deliverables Tracker" else "secondary", on_click=set_view, args=("Deliverables Tracker",))
 
 
 st.divider()
@@ -137,7 +375,7 @@ st.divider()
 
 
 # --- Default Selection for First Load ---
-all_types = sorted(list(set([p.get('type', 'Unknown') for p in projects])))
+all_types = sorted({p.get('type', 'Unknown') for p in projects})
 if 'selected_types' not in st.session_state:
     st.session_state.selected_types = all_types
 
@@ -171,7 +409,8 @@ def modal_create_project():
         submitted = st.form_submit_button("Create Project")
         
         if submitted and new_name:
-            new_id = int(datetime.now().timestamp())
+            # utils.new_id: strictly increasing, so the project and its modules never share an id
+            new_id = utils.new_id()
             new_proj = {
                 "id": new_id,
                 "name": new_name,
@@ -187,27 +426,22 @@ def modal_create_project():
             }
             
             for i in range(num_modules):
-                mod_id = new_id + i + 1
-                project_gw_defaults = { "p": "", "a": "", "ecn": "" }
+                mod_id = utils.new_id()
+                mod_gws = empty_gateways()
                 # Set D0 Plan for module same as project start
-                d0_gw = project_gw_defaults.copy()
-                d0_gw['p'] = str(d0_date)
+                mod_gws['D0']['p'] = str(d0_date)
                 
                 new_proj['modules'].append({
                     "id": mod_id,
                     "name": f"Module {i+1}",
-                    "gateways": { 
-                        "D0": d0_gw, "D1": project_gw_defaults.copy(), 
-                        "D2": project_gw_defaults.copy(), "D3": project_gw_defaults.copy(), 
-                        "D4": project_gw_defaults.copy() 
-                    }
+                    "gateways": mod_gws
                 })
             
             # --- Dynamic Scope Population ---
             new_proj['deliverables'] = utils.populate_deliverables(new_id, new_type)
             
             projects.append(new_proj)
-            if utils.save_data(projects):
+            if save_projects(projects):
                 st.success(f"Project '{new_name}' created!")
                 st.rerun()
             else:
@@ -230,9 +464,10 @@ def modal_upload_csv():
     
     if uploaded_file is not None:
         if st.button("Process Upload"):
-            updated_projects, msg = utils.process_csv_upload(uploaded_file, projects)
+            # Merge into a copy: a failed import must not leave half-merged rows in the session's projects
+            updated_projects, msg = utils.process_csv_upload(uploaded_file, copy.deepcopy(projects))
             if msg == "Success":
-                if utils.save_data(updated_projects):
+                if save_projects(updated_projects):
                     st.success("Data uploaded and merged successfully!")
                     st.rerun()
                 else:
@@ -240,161 +475,176 @@ def modal_upload_csv():
             else:
                 st.error(msg)
 
-# --- Main Content ---
-
-if st.session_state.view == "Dashboard":
-
-
-    # Custom styling for Cards
-    st.markdown("""
-    <style>
-        .dash-card {
-            background-color: #262730; /* Dark card background */
-            border-radius: 12px;
-            padding: 20px;
-            box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.5);
-            position: relative;
-            overflow: hidden;
-            height: 140px;
-            border: 1px solid #3f3f46;
-        }
-        .dash-card::before {
-            content: "";
-            position: absolute;
-            top: -20px;
-            right: -20px;
-            width: 80px;
-            height: 80px;
-            border-radius: 50%;
-            opacity: 0.1; /* Lower opacity for dark mode */
-        }
-        .card-blue::before { background-color: #60a5fa; }
-        .card-green::before { background-color: #34d399; }
-        .card-yellow::before { background-color: #fbbf24; }
-        .card-red::before { background-color: #f87171; }
-        
-        .card-label { font-size: 0.8rem; font-weight: bold; text-transform: uppercase; margin-bottom: 5px; display: flex; align-items: center; gap: 5px; color: #e5e7eb; }
-        .card-value { font-size: 2.5rem; font-weight: 800; color: #f9fafb; line-height: 1; }
-        .card-sub { font-size: 0.8rem; color: #9ca3af; margin-top: 5px; }
-        
-        /* Status Badge CSS (Modern Pastel) */
-        .status-badge {
-            padding: 4px 12px;
-            border-radius: 6px;
-            font-size: 0.8rem;
-            font-weight: 700; /* Bold */
-            display: inline-block;
-            margin-bottom: 2px;
-            border: 1px solid transparent; /* No border needed for pastel usually */
-        }
-        /* Pastel Colors */
-        .bg-green { background-color: #E6F4EA; color: #137333; } /* On Track */
-        .bg-yellow { background-color: #FEF7E0; color: #B06000; } /* At Risk - Darker Orange text for contrast */
-        .bg-red { background-color: #FCE8E6; color: #C5221F; } /* Critical */
-        .bg-grey { background-color: #F3F4F6; color: #4B5563; } /* Pending */
-        
-        .plan-date { font-size: 0.7rem; color: #6b7280; margin-top: 2px; display: block; }
-        
-        /* Table Border Styling for Gateway Status */
-        .gateway-table-cell {
-            border: 1px solid #f3f4f6; /* Very subtle border */
-            padding: 8px;
-            text-align: center;
-            background-color: #ffffff; 
-            color: #1f2937;
-            border-radius: 4px; /* Soft edges */
-        }
-        .gateway-table-header {
-            border-bottom: 2px solid #e5e7eb;
-            padding-bottom: 8px;
-            font-weight: bold;
-            color: #111827; 
-            text-transform: uppercase;
-            font-size: 0.85rem;
-            letter-spacing: 0.05em;
-            text-align: center;
-        }
-        
-        /* Vibrant AI Expander Styling */
-        div[data-testid="stExpander"] details summary p {
-            font-size: 1.2rem;
-            font-weight: 700;
-            color: #4f46e5; /* Indigo */
-        }
-        
-    </style>
-    """, unsafe_allow_html=True)
+# --- Cached Dashboard Model ---
+@st.cache_data(show_spinner=False)
+def compute_dashboard_model(data_version, selected_types, _projects):
+    """
+    Derives everything the Dashboard needs from the project data:
+    stats cards, adherence rate, per-project module gateway counts and Gantt rows.
+    Keyed on the data version `_projects` was loaded at (utils.db_version(), the counter save_data bumps)
+    + selected types; _projects is read, not hashed. The entry is shared by all sessions, so only a
+    list exactly as loaded at that version may be passed (saves drop the session's version, forcing a reload).
+    """
+    filtered = [p for p in _projects if p.get('type') in selected_types]
     
-    # Calculate Stats
-    stats = utils.calculate_dashboard_stats(filtered_projects)
-    # Calculate Adherence Rate (Gateways On Track / Total Released Gateways)
-    # User Request: Denominator = Total Gateways released. Numerator = Gateways released on track.
+    stats = utils.calculate_dashboard_stats(filtered)
     
-    total_released_gateways = 0
-    on_track_gateways = 0
+    # Flat frames (Project Plan vs Module Actual); reused for adherence + module status bars
+    projects_df, gw_df = utils.build_gateway_frames(filtered)
+    
+    # Denominator: any entered Module Actual counts as released, parseable or not
+    released = gw_df['has_actual']
+    # Numerator: Released on or before plan date (NaT plan never compares True)
+    on_track = released & (gw_df['actual'] <= gw_df['plan'])
+    
+    total_released_gateways = int(released.sum())
+    on_track_gateways = int(on_track.sum())
     
-    for p in filtered_projects:
-        if 'modules' in p:
-            for m in p['modules']:
-                for gw in ['D0','D1','D2','D3','D4']:
-                    # Use Project Plan for comparison (Consistent with Detailed View Status)
-                    p_date = p['gateways'].get(gw, {}).get('p')
-                    # Module Actual
-                    a_date = m['gateways'].get(gw, {}).get('a')
-                    
-                    if a_date:
-                        total_released_gateways += 1
-                        # Numerator: Released on or before plan date.
-                        # Strictly requires Plan Date to exist and Actual <= Plan.
-                        if p_date and a_date <= p_date:
-                            on_track_gateways += 1
-                        
     # Avoid Divide by Zero
     if total_released_gateways > 0:
         adherence_rate = (on_track_gateways / total_released_gateways * 100)
     else:
         adherence_rate = 0
-
-    # --- Top Header (Title + Controls) ---
-    head_c1, head_c2 = st.columns([0.7, 0.3])
     
-    with head_c1:
-        st.title("Dashboard Overview")
-        st.caption("Real-time status of all active programs")
-        
-    with head_c2:
-        # Controls Stacked Vertically
-        # Filter
-        valid_defaults = [t for t in st.session_state.selected_types if t in all_types]
-        new_selection = st.multiselect("Filter Project Type", all_types, default=valid_defaults, key="dash_filter_types", label_visibility="collapsed", placeholder="Select Filters...")
-        if new_selection != st.session_state.selected_types:
-            st.session_state.selected_types = new_selection
-            st.rerun()
-
-        # Download Button
-        excel_data = utils.projects_to_excel(filtered_projects)
-        file_name_date = datetime.now().strftime("%d-%m-%Y")
-        st.download_button(
-             label="📥 Download Report",
-             data=excel_data,
-             file_name=f"Project_Status_{file_name_date}.xlsx",
-             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-             key="dash_download_xlsx",
-             use_container_width=True
-        )
-
-    # --- AI Assistant (Collapsed by Default) ---
+    # Per-project module gateway counts (only gateways with both Plan and Actual)
+    # Totals count every entered pair; unparseable dates stay in the total but in no colour bucket
+    delay = utils.delay_days(gw_df['plan'].to_numpy(), gw_df['actual'].to_numpy())
+    counts = utils.bucket_delays(delay, gw_df['project_idx'].to_numpy(), len(projects_df))
+    total_counts = np.bincount(
+        gw_df['project_idx'].to_numpy()[(gw_df['has_plan'] & gw_df['has_actual']).to_numpy()],
+        minlength=len(projects_df)
+    )
+    
+    # Gantt Rows (vectorized over the flat frames)
+    n_gw = len(utils.GATEWAYS)
+    gw_labels = np.array(utils.GATEWAYS, dtype=object)
+    p_plans = projects_df[[f'plan_{gw}' for gw in utils.GATEWAYS]].to_numpy()
+    p_labels = np.array([f"🅿️ {name}" for name in projects_df['name']], dtype=object)
+    m_labels = np.array(
+        [f"   └─ {m['name']}" + "\u200B" * (p['id'] % 100) for p in filtered for m in p.get('modules', [])],
+        dtype=object
+    )
+    m_plans = gw_df['plan'].to_numpy().reshape(-1, n_gw)
+    m_acts = gw_df['actual'].to_numpy().reshape(-1, n_gw)
+    m_proj = gw_df['project_idx'].to_numpy()[::n_gw]
+    
+    # Y-axis ordering: Project -> its Modules -> Next Project
+    task_order = np.concatenate([p_labels, m_labels])[
+        np.argsort(np.concatenate([np.arange(len(p_labels)), m_proj]), kind='stable')
+    ].tolist()
+    
+    # Project Plan Range (D0 to D4)
+    has_range = ~np.isnat(p_plans[:, 0]) & ~np.isnat(p_plans[:, -1])
+    plan_idx = np.flatnonzero(has_range)
+    plan_rows = pd.DataFrame({
+        "Task": p_labels[plan_idx],
+        "Start": np.datetime_as_string(p_plans[plan_idx, 0], unit='D'),
+        "Finish": np.datetime_as_string(p_plans[plan_idx, -1], unit='D'),
+        "Resource": "Plan",
+        "Description": [f"Type: {filtered[i].get('type')}" for i in plan_idx]
+    })
+    
+    # Module Actuals: one segment per consecutive gateway pair with both actuals
+    seg_k, seg_i = np.nonzero(~np.isnat(m_acts[:, :-1]) & ~np.isnat(m_acts[:, 1:]))
+    seg_end = m_acts[seg_k, seg_i + 1]
+    # Status vs Project Plan of the end gateway (missing plan counts as On Track)
+    seg_status = utils.classify_status(m_plans[seg_k, seg_i + 1], seg_end)
+    seg_rows = pd.DataFrame({
+        "Task": m_labels[seg_k],
+        "Start": np.datetime_as_string(m_acts[seg_k, seg_i], unit='D'),
+        "Finish": np.datetime_as_string(seg_end, unit='D'),
+        "Resource": GANTT_ACTUAL_LABELS[seg_status],
+        "Description": gw_labels[seg_i] + " -> " + gw_labels[seg_i + 1]
+    })
+    
+    # Milestones: Plan (projects with a D0-D4 range) + Actual (modules)
+    ms_pi, ms_pg = np.nonzero(has_range[:, None] & ~np.isnat(p_plans))
+    ms_mk, ms_mg = np.nonzero(~np.isnat(m_acts))
+    plan_ms = pd.DataFrame({
+        "Task": p_labels[ms_pi],
+        "Date": np.datetime_as_string(p_plans[ms_pi, ms_pg], unit='D'),
+        "Gateway": gw_labels[ms_pg],
+        "Type": "Plan"
+    })
+    act_ms = pd.DataFrame({
+        "Task": m_labels[ms_mk],
+        "Date": np.datetime_as_string(m_acts[ms_mk, ms_mg], unit='D'),
+        "Gateway": gw_labels[ms_mg],
+        "Type": "Actual"
+    })
+    
+    # Restore per-project row order (Project Plan first, then its Modules)
+    gantt_df = pd.concat([plan_rows, seg_rows], ignore_index=True).iloc[np.lexsort((
+        np.concatenate([np.zeros(len(plan_idx)), seg_i]),
+        np.concatenate([np.full(len(plan_idx), -1), seg_k]),
+        np.concatenate([plan_idx, m_proj[seg_k]])
+    ))]
+    milestone_df = pd.concat([plan_ms, act_ms], ignore_index=True).iloc[np.lexsort((
+        np.concatenate([ms_pg, ms_mg]),
+        np.concatenate([np.full(len(ms_pi), -1), ms_mk]),
+        np.concatenate([ms_pi, m_proj[ms_mk]])
+    ))]
+    milestone_df['Hover'] = milestone_df['Gateway'].str.cat(milestone_df['Date'], sep=': ')
+
+    return {
+        "stats": stats,
+        "adherence_rate": adherence_rate,
+        "on_track_gateways": on_track_gateways,
+        "total_released_gateways": total_released_gateways,
+        "total_counts": total_counts,
+        "green_counts": counts[:, 0],
+        "yellow_counts": counts[:, 1],
+        "red_counts": counts[:, 2],
+        "gantt_df": gantt_df,
+        "milestone_df": milestone_df,
+        "task_order": task_order
+    }
+
+@st.cache_data(show_spinner=False)
+def project_readiness(data_version, project_ids):
+    """Readiness (score, summary) per project id, cached per DB version so Dashboard reruns skip the query."""
+    return utils.calculate_readiness_batch(project_ids)
+
+@st.cache_data(show_spinner=False)
+def build_gauge_figure(rate):
+    """Builds the Module Adherence gauge and returns it as a Plotly figure dict (cached per rate)."""
+    fig_gauge = go.Figure(go.Indicator(
+        mode = "gauge+number",
+        value = rate,
+        title = {'text': "Module Adherence %", 'font': {'size': 14}}, # Title inside chart
+        gauge = {
+            'axis': {'range': [None, 100]},
+            'bar': {'color': "#3b82f6"},
+            'steps': [
+                {'range': [0, 50], 'color': "#7f1d1d"}, # Dark Red
+                {'range': [50, 80], 'color': "#78350f"}, # Dark Yellow
+                {'range': [80, 100], 'color': "#064e3b"}], # Dark Green
+            'threshold': {
+                'line': {'color': "#fca5a5", 'width': 4},
+                'thickness': 0.75,
+                'value': 90}}))
+    # Zero margins to fit inside the "tile" height and align with CSS cards
+    # Increased height slightly to 160 to fill the space better if needed, or stick to 140
+    # CSS cards are 140px. Let's maximize chart usage. 
+    # t=30 is needed for title.
+    # Updated bgcolor to match dark card, font white for contrast
+    fig_gauge.update_layout(height=150, margin=dict(l=20,r=20,t=40,b=20), paper_bgcolor="#262730", font={'color': "white"},
+                            uirevision='adh', transition_duration=0)
+    return fig_gauge.to_dict()
+
+@st.fragment
+def render_ai_report(projects):
+    """AI Status Report Generator; runs as a fragment so its widgets only rerun this block."""
     with st.expander("✨ AI Status Report Generator", expanded=False):
         st.info("Select a project below to generate an executive summary based on real-time data.")
         
-        ai_c1, ai_c2 = st.columns([1, 1])
+        # Bottom-aligned columns line the button up with the selectbox without spacer elements
+        ai_c1, ai_c2 = st.columns([1, 1], vertical_alignment="bottom")
         with ai_c1:
             ai_proj_names = [p['name'] for p in projects]
             selected_ai_proj = st.selectbox("Select Project for AI Report", ai_proj_names, key="dash_ai_proj_sel")
         
         with ai_c2:
-            st.write("") # Spacer
-            st.write("")
             gen_btn = st.button("Generate Report", key="dash_gen_ai_btn", type="primary")
             
         if gen_btn:
@@ -411,24 +661,16 @@ if st.session_state.view == "Dashboard":
                     }
                     
                     # 2. Gather Delays
-                    delay_list = []
-                    if 'modules' in proj_data:
-                        for m in proj_data['modules']:
-                            for gw in ['D0','D1','D2','D3','D4']:
-                                p_d = proj_data['gateways'].get(gw, {}).get('p')
-                                a_d = m['gateways'].get(gw, {}).get('a')
-                                if p_d and a_d:
-                                    try:
-                                        pd_dt = datetime.strptime(p_d, "%Y-%m-%d")
-                                        ad_dt = datetime.strptime(a_d, "%Y-%m-%d")
-                                        days = (ad_dt - pd_dt).days
-                                        if days > 0:
-                                            delay_list.append({
-                                                "module": m['name'],
-                                                "gateway": gw,
-                                                "days": days
-                                            })
-                                    except: pass
+                    ai_plan, ai_actual, _, ai_mod_idx = utils.flatten_gateways([proj_data])
+                    ai_delays = utils.delay_days(ai_plan, ai_actual)
+                    delay_list = [
+                        {
+                            "module": proj_data['modules'][ai_mod_idx[i]]['name'],
+                            "gateway": utils.GATEWAYS[i % len(utils.GATEWAYS)],
+                            "days": int(ai_delays[i])
+                        }
+                        for i in np.flatnonzero(ai_delays > 0)
+                    ]
                     
                     # 3. Call AI Engine
                     ai_summary = utils_ai.generate_project_summary(selected_ai_proj, status_info, delay_list)
@@ -440,6 +682,94 @@ if st.session_state.view == "Dashboard":
             else:
                 st.error("Project data not found.")
 
+def tree_frame(p, edit_gws=utils.GATEWAYS):
+    """
+    Rows for the Detailed View data_editor: Project -> Modules -> Sub-modules.
+    Per gateway: status icon, plus plan (project row), actual, ECN (module/sub rows) for the gateways in edit_gws.
+    """
+    nodes = [("project", p)]
+    for m in p.get('modules') or []:
+        nodes.append(("module", m))
+        nodes += [("sub", s) for s in m.get('sub_modules') or []]
+    
+    plan = {gw: p['gateways'].get(gw, {}).get('p') for gw in utils.GATEWAYS}
+    rows = []
+    for kind, node in nodes:
+        row = {"Level": {"project": "Project", "module": "↳ Module", "sub": "   ↳ Sub-module"}[kind], "Name": node['name']}
+        for gw in utils.GATEWAYS:
+            gw_data = node['gateways'].get(gw, {})
+            row[f"{gw}_s"] = STATUS_ICONS.get(utils.get_status(plan[gw], gw_data.get('a')), "⚪")
+            if gw not in edit_gws:
+                continue
+            row[f"{gw}_p"] = parse_date(plan[gw]) if kind == "project" else None
+            row[f"{gw}_a"] = parse_date(gw_data.get('a'))
+            row[f"{gw}_ecn"] = gw_data.get('ecn', "") if kind != "project" else None
+        rows.append(row)
+    
+    return pd.DataFrame(rows)
+
+@st.cache_data(show_spinner=False)
+def build_tree_frame(project_id, data_version, edit_gws, _p):
+    """
+    tree_frame cached per project id + data version (st.session_state.projects_version) + edit_gws.
+    _p is read, not hashed: pass only a project exactly as loaded at that version (see compute_dashboard_model).
+    """
+    return tree_frame(_p, edit_gws)
+
+@st.cache_data(show_spinner=False)
+def build_checklist_frame(delivs_json):
+    """
+    Rows for the Deliverables Tracker data_editor, statuses shown with their colour labels.
+    Cached on the gateway's deliverables JSON, so reruns that leave the checklist alone reuse the frame.
+    """
+    df = pd.DataFrame(json.loads(delivs_json))
+    # Dict map; unknown statuses pass through
+    df['status'] = df['status'].map(DELIV_STATUS_LABELS).fillna(df['status'])
+    return df
+
+# --- Main Content ---
+
+if st.session_state.view == "Dashboard":
+
+
+    
+    # Calculate Stats + Adherence Rate (Gateways On Track / Total Released Gateways)
+    # User Request: Denominator = Total Gateways released. Numerator = Gateways released on track.
+    # Keyed on the data version `projects` was loaded at (not a fresh read: another session may have written since)
+    model = compute_dashboard_model(st.session_state.projects_version, tuple(st.session_state.selected_types), projects)
+    stats = model['stats']
+    adherence_rate = model['adherence_rate']
+    on_track_gateways = model['on_track_gateways']
+    total_released_gateways = model['total_released_gateways']
+
+    # --- Top Header (Title + Controls) ---
+    head_c1, head_c2 = st.columns([0.7, 0.3])
+    
+    with head_c1:
+        st.title("Dashboard Overview")
+        st.caption("Real-time status of all active programs")
+        
+    with head_c2:
+        # Controls Stacked Vertically
+        # Filter
+        valid_defaults = [t for t in st.session_state.selected_types if t in all_types]
+        st.multiselect("Filter Project Type", all_types, default=valid_defaults, key="dash_filter_types", label_visibility="collapsed", placeholder="Select Filters...", on_change=sync_selected_types)
+
+        # Download Button
+        excel_data = utils.projects_to_excel(filtered_projects)
+        file_name_date = datetime.now().strftime("%d-%m-%Y")
+        st.download_button(
+             label="📥 Download Report",
+             data=excel_data,
+             file_name=f"Project_Status_{file_name_date}.xlsx",
+             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+             key="dash_download_xlsx",
+             use_container_width=True
+        )
+
+    # --- AI Assistant (Collapsed by Default) ---
+    render_ai_report(projects)
+
     # 1. Overview Cards
     st.markdown("### 🚀 Project Health Overview")
     
@@ -484,166 +814,57 @@ if st.session_state.view == "Dashboard":
         """, unsafe_allow_html=True)
 
     with k5:
-        # Gauge Chart
-        fig_gauge = go.Figure(go.Indicator(
-            mode = "gauge+number",
-            value = adherence_rate,
-            title = {'text': "Module Adherence %", 'font': {'size': 14}}, # Title inside chart
-            gauge = {
-                'axis': {'range': [None, 100]},
-                'bar': {'color': "#3b82f6"},
-                'steps': [
-                    {'range': [0, 50], 'color': "#7f1d1d"}, # Dark Red
-                    {'range': [50, 80], 'color': "#78350f"}, # Dark Yellow
-                    {'range': [80, 100], 'color': "#064e3b"}], # Dark Green
-                'threshold': {
-                    'line': {'color': "#fca5a5", 'width': 4},
-                    'thickness': 0.75,
-                    'value': 90}}))
-        # Zero margins to fit inside the "tile" height and align with CSS cards
-        # Increased height slightly to 160 to fill the space better if needed, or stick to 140
-        # CSS cards are 140px. Let's maximize chart usage. 
-        # t=30 is needed for title.
-        # Updated bgcolor to match dark card, font white for contrast
-        fig_gauge.update_layout(height=150, margin=dict(l=20,r=20,t=40,b=20), paper_bgcolor="#262730", font={'color': "white"})
-        st.plotly_chart(fig_gauge, use_container_width=True)
+        # Gauge Chart (figure cached per whole-percent value)
+        fig_gauge = go.Figure(build_gauge_figure(round(adherence_rate)))
+        st.plotly_chart(fig_gauge, use_container_width=True, config={'staticPlot': True})
         st.caption(f"Metrics: {on_track_gateways} On Track Gws / {total_released_gateways} Total Gateways Released")
 
 
-    # --- CSS for Table Layout ---
-    st.markdown("""
-    <style>
-        .gateway-table-cell {
-            padding: 8px;
-            text-align: center;
-            background-color: #ffffff; 
-            color: #1f2937;
-            border-radius: 0px; 
-            margin-bottom: 5px;
-            height: 100%;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            flex-direction: column;
-        }
-        .gateway-table-header {
-            font-weight: bold;
-            color: #111827; 
-            text-transform: uppercase;
-            font-size: 0.8rem;
-            letter-spacing: 0.05em;
-            text-align: center;
-            border-bottom: 2px solid #e5e7eb;
-            padding-bottom: 8px;
-            margin-bottom: 10px;
-            /* Vertical Grid Line for Header */
-            border-right: 1px solid #e5e7eb;
-            height: 100%;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-        }
-        /* Row Item Styling equivalent to cell for non-badge items */
-        .row-item {
-            text-align: center;
-            height: 100%;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            border-right: 1px solid #e5e7eb; /* Vertical Grid Line */
-            padding: 0 5px;
-        }
-        
-        .row-container {
-             background-color: white; 
-             border-bottom: 1px solid #f3f4f6; 
-             padding-top: 10px; 
-             padding-bottom: 10px;
-        }
-
-        /* Inline Stacked Bar */
-        .stacked-bar-container {
-            width: 100%;
-            height: 16px;
-            background-color: #e5e7eb;
-            border-radius: 8px;
-            overflow: hidden;
-            display: flex;
-            margin-top: 4px;
-        }
-        .bar-seg { height: 100%; }
-        .bar-green { background-color: #10b981; }
-        .bar-yellow { background-color: #f59e0b; }
-        .bar-red { background-color: #ef4444; }
-    </style>
-    """, unsafe_allow_html=True)
     
-    # --- Custom Table Header ---
+    # --- Gateway Status Table (one HTML block; CSS grid handles the 9 columns) ---
     st.subheader("Project Gateway Status")
     
     # 9 Columns: Project, Type, Readiness, Modules(Graph), D0, D1, D2, D3, D4
-    cols = st.columns([1.5, 0.8, 1, 2.5, 1, 1, 1, 1, 1])
     headers = ["PROJECT", "TYPE", "DELIVERABLES", "MODULES RELEASED", "D0", "D1", "D2", "D3", "D4"]
-    for i, h in enumerate(headers):
-        # Last column needs no right border if we want to be strict, but consistent border is fine
-        border_style = "" if i == len(headers)-1 else ""
-        cols[i].markdown(f"<div class='gateway-table-header' style='{border_style}'>{h}</div>", unsafe_allow_html=True)
-        
-    st.write("") # Spacer
+    table_html = ["<div class='gateway-table'>"]
+    table_html += [f"<div class='gateway-table-header'>{h}</div>" for h in headers]
     
-    for p in filtered_projects:
-        # Layout
-        r_cols = st.columns([1.5, 0.8, 1, 2.5, 1, 1, 1, 1, 1])
-        
+    total_counts = model['total_counts']
+    green_counts = model['green_counts']
+    yellow_counts = model['yellow_counts']
+    red_counts = model['red_counts']
+    
+    # Readiness for all non-Carryover rows in one batched lookup
+    readiness_map = project_readiness(
+        st.session_state.projects_version,
+        tuple(p['id'] for p in filtered_projects if p['type'] != 'Carryover')
+    )
+    
+    for p_i, p in enumerate(filtered_projects):
         # 1. Project Name
-        r_cols[0].markdown(f"<div class='row-item'><b>{p['name']}</b></div>", unsafe_allow_html=True)
+        name_html = f"<div class='row-item'><b>{p['name']}</b></div>"
         
         # 2. Type
-        r_cols[1].markdown(f"<div class='row-item'><span style='padding:2px 8px; border-radius:4px; font-size:0.8em; border: 1px solid #3f3f46; color: #9ca3af;'>{p['type']}</span></div>", unsafe_allow_html=True)
+        type_html = f"<div class='row-item'><span style='padding:2px 8px; border-radius:4px; font-size:0.8em; border: 1px solid #3f3f46; color: #9ca3af;'>{p['type']}</span></div>"
         
         # 3. Readiness (Text Color Coded)
         if p['type'] == 'Carryover':
             r_score = 100
         else:
-            score_val, _ = utils.calculate_project_readiness(p['id'])
-            r_score = int(score_val)
+            r_score = int(readiness_map[p['id']][0])
             
         r_color = "#10b981"
         if r_score < 75: r_color = "#ef4444"
         elif r_score < 90: r_color = "#f59e0b"
         
-        r_cols[2].markdown(f"<div class='row-item'><span style='color: {r_color}; font-weight: bold;'>{r_score}%</span></div>", unsafe_allow_html=True)
+        readiness_html = f"<div class='row-item'><span style='color: {r_color}; font-weight: bold;'>{r_score}%</span></div>"
         
         # 4. Modules Released (Inline Stacked Bar)
-        # Calculate status counts
-        c_green = 0
-        c_yellow = 0
-        c_red = 0
-        total_m = 0
-        
-        if 'modules' in p:
-            for m in p['modules']:
-                 # Check each gateway for this module
-                 for gw in ['D0','D1','D2','D3','D4']:
-                     p_d = p['gateways'].get(gw, {}).get('p')
-                     a_d = m['gateways'].get(gw, {}).get('a')
-                     
-                     if p_d and a_d:
-                         total_m += 1 # Count this gateway event
-                         
-                         try:
-                             pd_dt = datetime.strptime(p_d, "%Y-%m-%d")
-                             ad_dt = datetime.strptime(a_d, "%Y-%m-%d")
-                             delay_days = (ad_dt - pd_dt).days
-                             
-                             if delay_days <= 0:
-                                 c_green += 1
-                             elif delay_days <= 30:
-                                 c_yellow += 1
-                             else:
-                                 c_red += 1
-                         except:
-                             pass
+        # Status counts from the flattened arrays (precomputed in the dashboard model)
+        c_green = int(green_counts[p_i])
+        c_yellow = int(yellow_counts[p_i])
+        c_red = int(red_counts[p_i])
+        total_m = int(total_counts[p_i])
         
         # Generate Bar HTML
         if total_m > 0:
@@ -651,27 +872,27 @@ if st.session_state.view == "Dashboard":
             pct_y = (c_yellow / total_m) * 100
             pct_r = (c_red / total_m) * 100
             
-            bar_html = f"""
-            <div class='row-item' style='flex-direction:column; padding: 5px 10px;'>
-                <div style="width: 100%; display:flex; justify-content:space-between; font-size:0.75rem; margin-bottom:2px; font-weight:bold;">
-                    <span style="color:#ef4444;">{c_red} Delay</span>
-                    <span style="color:#f59e0b;">{c_yellow} Risk</span>
-                    <span style="color:#10b981;">{c_green} OnTrack</span>
-                </div>
-                <div class="stacked-bar-container">
-                    <div class="bar-seg bar-red" style="width: {pct_r}%;"></div>
-                    <div class="bar-seg bar-yellow" style="width: {pct_y}%;"></div>
-                    <div class="bar-seg bar-green" style="width: {pct_g}%;"></div>
-                </div>
-            </div>
-            """
-            r_cols[3].markdown(bar_html, unsafe_allow_html=True)
+            bar_html = (
+                f"<div class='row-item' style='flex-direction:column; padding: 5px 10px;'>"
+                f"<div style='width: 100%; display:flex; justify-content:space-between; font-size:0.75rem; margin-bottom:2px; font-weight:bold;'>"
+                f"<span style='color:#ef4444;'>{c_red} Delay</span>"
+                f"<span style='color:#f59e0b;'>{c_yellow} Risk</span>"
+                f"<span style='color:#10b981;'>{c_green} OnTrack</span>"
+                f"</div>"
+                f"<div class='stacked-bar-container'>"
+                f"<div class='bar-seg bar-red' style='width: {pct_r}%;'></div>"
+                f"<div class='bar-seg bar-yellow' style='width: {pct_y}%;'></div>"
+                f"<div class='bar-seg bar-green' style='width: {pct_g}%;'></div>"
+                f"</div>"
+                f"</div>"
+            )
         else:
-            r_cols[3].markdown("<div class='row-item'><span style='color:#9ca3af; font-size:0.8em;'>No Releases</span></div>", unsafe_allow_html=True)
+            bar_html = "<div class='row-item'><span style='color:#9ca3af; font-size:0.8em;'>No Releases</span></div>"
 
         # 5-9. Gateways (Badges with Plan)
-        gws = ['D0', 'D1', 'D2', 'D3', 'D4']
-        for i, gw in enumerate(gws):
+        gw_html = []
+        gws = utils.GATEWAYS
+        for gw in gws:
             plan = p['gateways'].get(gw, {}).get('p')
             actual = p['gateways'].get(gw, {}).get('a')
             
@@ -679,150 +900,91 @@ if st.session_state.view == "Dashboard":
             if actual:
                 status = utils.get_status(plan, actual)
             
-            def fmt(d):
-                if not d: return "Pending"
-                try: return datetime.strptime(d, "%Y-%m-%d").strftime("%b-%y")
-                except: return d
-            
-            badge_txt = fmt(actual) if actual else "Pending"
-            plan_txt = f"Plan: {fmt(plan)}" if plan else ""
-            
-            bg_class = f"bg-{status}"
+            badge_txt = fmt_month(actual) if actual else "Pending"
+            plan_txt = f"Plan: {fmt_month(plan)}" if plan else ""
             
             # Use 'gateway-table-cell' for the grid look on date cols
-            html = f"""
-            <div class="gateway-table-cell">
-                <span class="status-badge {bg_class}">{badge_txt}</span>
-                <span class="plan-date">{plan_txt}</span>
-            </div>
-            """
-            r_cols[4+i].markdown(html, unsafe_allow_html=True)
-            
-        st.markdown("<div style='border-bottom: 1px solid #f3f4f6; margin-top: 0px; margin-bottom: 0px;'></div>", unsafe_allow_html=True)
+            gw_html.append(f"<div class='gateway-table-cell'><span class='status-badge bg-{status}'>{badge_txt}</span><span class='plan-date'>{plan_txt}</span></div>")
+        
+        # One string per row: 9 cells + separator
+        table_html.append(f"{name_html}{type_html}{readiness_html}{bar_html}{''.join(gw_html)}<div class='gateway-table-sep'></div>")
+    
+    table_html.append("</div>")
+    st.markdown("".join(table_html), unsafe_allow_html=True)
 
     # --- Gantt Chart Integration ---
     st.markdown("### Project Gantt Chart")
     
-    gantt_rows = []
-    milestone_data = [] # Store milestones: Task, Date, Label, Color
-    task_order = []  # To enforce Y-axis ordering (Project -> Modules -> Next Project)
-
-    for p in filtered_projects:
-        # Project Label
-        p_label = f"🅿️ {p['name']}"
-        task_order.append(p_label)
-
-        # Project Plan Range (D0 to D4)
-        if p['gateways'].get('D0', {}).get('p') and p['gateways'].get('D4', {}).get('p'):
-             gantt_rows.append({
-                "Task": p_label,
-                "Start": p['gateways']['D0']['p'],
-                "Finish": p['gateways']['D4']['p'],
-                "Resource": "Plan",
-                "Description": f"Type: {p.get('type')}"
-            })
-             # Collect Milestones
-             for gw in ['D0', 'D1', 'D2', 'D3', 'D4']:
-                 d = p['gateways'].get(gw, {}).get('p')
-                 if d:
-                     milestone_data.append({
-                         "Task": p_label, "Date": d, "Gateway": gw, "Type": "Plan", "Color": "#1e3a8a" # darker blue
-                     })
-             
-        # Module Actuals
-        if 'modules' in p:
-            for m in p['modules']:
-                unique_suffix = "\u200B" * (p['id'] % 100) 
-                m_display = f"   └─ {m['name']}{unique_suffix}"
-                task_order.append(m_display)
-                # Segmented Actuals Logic
-                # Use pairs of gateways (Start -> End)
-                gws_ordered = ['D0', 'D1', 'D2', 'D3', 'D4']
-                
-                # Get all actual dates for this module
-                m_acts = {}
-                for gw in gws_ordered:
-                    val = m['gateways'].get(gw, {}).get('a')
-                    if val: m_acts[gw] = val
-
-                # Iterate pairs
-                for i in range(len(gws_ordered) - 1):
-                    start_gw = gws_ordered[i]
-                    end_gw = gws_ordered[i+1]
-                    
-                    if start_gw in m_acts and end_gw in m_acts:
-                         s_date = m_acts[start_gw]
-                         e_date = m_acts[end_gw]
-                         p_target = p['gateways'].get(end_gw, {}).get('p')
-                         status = utils.get_status(p_target, e_date)
-                         
-                         color = "#1e3a8a" # Default Blue
-                         if status == 'yellow': color = "#d97706" # Amber
-                         elif status == 'red': color = "#b91c1c" # Red
-                         
-                         # Add Segment Bar
-                         gantt_rows.append({
-                            "Task": m_display,
-                            "Start": s_date,
-                            "Finish": e_date,
-                            "Resource": "Actual (On Track)" if color == "#1e3a8a" else ("Actual (At Risk)" if color == "#d97706" else "Actual (Delay)"),
-                            "Description": f"{start_gw} -> {end_gw}",
-                            "Color": color
-                         })
-                         
-                # Collect Milestones
-                for gw in ['D0', 'D1', 'D2', 'D3', 'D4']:
-                    d = m['gateways'].get(gw, {}).get('a')
-                    if d:
-                        milestone_data.append({
-                            "Task": m_display, "Date": d, "Gateway": gw, "Type": "Actual", "Color": "#5b21b6" # darker purple
-                        })
-
+    df_gantt = model['gantt_df']
+    df_ms = model['milestone_df'] # Milestones: Task, Date, Gateway, Type, Hover
+    task_order = model['task_order']  # To enforce Y-axis ordering (Project -> Modules -> Next Project)
+    
     # Render Chart
-    if gantt_rows:
-        df_gantt = pd.DataFrame(gantt_rows)
+    if not df_gantt.empty:
+        
+        # Rows as integer positions: each label is sent once (ticktext) instead of once per point
+        task_order = list(dict.fromkeys(task_order))
+        row_pos = {task: i for i, task in enumerate(task_order)}
         
-        fig_gantt = px.timeline(df_gantt, x_start="Start", x_end="Finish", y="Task", color="Resource", 
-                                color_discrete_map={
-                                    "Plan": "#93c5fd", # Light Blue
-                                    "Actual (On Track)": "#10b981", # Green
-                                    "Actual (At Risk)": "#f59e0b", # Amber
-                                    "Actual (Delay)": "#ff0000" # Bright Red
-                                },
-                                category_orders={"Task": task_order},
-                                hover_data=["Description"])
+        # Fixed height: show the first rows, pan vertically for the rest
+        visible_rows = min(len(task_order), GANTT_VISIBLE_ROWS)
+        # Bar thickness in px, scaled to the row pitch so dense charts don't overlap
+        bar_width = max(2, min(20, 0.6 * GANTT_HEIGHT / max(visible_rows, 1)))
         
-        # Add Milestones (Scatter)
-        if milestone_data:
-            df_ms = pd.DataFrame(milestone_data)
+        # WebGL segments: one trace per status, bars separated by None gaps
+        fig_gantt = go.Figure()
+        seg_groups = dict(tuple(df_gantt.groupby('Resource', sort=False)))
+        for resource, color in GANTT_COLORS.items():
+            seg = seg_groups.get(resource)
+            if seg is None:
+                continue
+            gap = np.full(len(seg), None)
+            rows = seg['Task'].map(row_pos).to_numpy()
+            hover = (seg['Task'].str.rstrip("\u200B") + "<br>" + seg['Start'] + " → " + seg['Finish'] + "<br>" + seg['Description']).to_numpy()
+            fig_gantt.add_trace(go.Scattergl(
+                x=np.column_stack([seg['Start'].to_numpy(), seg['Finish'].to_numpy(), gap]).ravel(),
+                y=np.column_stack([rows, rows, gap]).ravel(),
+                mode='lines', name=resource,
+                line=dict(color=color, width=bar_width),
+                hoverinfo='text', hovertext=np.column_stack([hover, hover, gap]).ravel()
+            ))
+        
+        # Add Milestones (Scatter, WebGL so they draw above the segments)
+        if not df_ms.empty:
             # Add trace for Plan Milestones
             ms_plan = df_ms[df_ms['Type'] == 'Plan']
             if not ms_plan.empty:
-                fig_gantt.add_trace(go.Scatter(
-                    x=ms_plan['Date'], y=ms_plan['Task'], mode='markers+text',
+                fig_gantt.add_trace(go.Scattergl(
+                    x=ms_plan['Date'], y=ms_plan['Task'].map(row_pos), mode='markers+text',
                     name='Plan Gateway', text=ms_plan['Gateway'],
                     textposition="middle center", textfont=dict(color='white'),
                     marker=dict(symbol='diamond', size=28, color='#2563eb', line=dict(color='white', width=1)),
-                    hoverinfo='text', hovertext=ms_plan.apply(lambda r: f"{r['Gateway']}: {r['Date']}", axis=1)
+                    hoverinfo='text', hovertext=ms_plan['Hover']
                 ))
             
             # Add trace for Actual Milestones
             ms_act = df_ms[df_ms['Type'] == 'Actual']
             if not ms_act.empty:
-                fig_gantt.add_trace(go.Scatter(
-                    x=ms_act['Date'], y=ms_act['Task'], mode='markers+text',
+                fig_gantt.add_trace(go.Scattergl(
+                    x=ms_act['Date'], y=ms_act['Task'].map(row_pos), mode='markers+text',
                     name='Actual Gateway', text=ms_act['Gateway'],
                     textposition="middle center", textfont=dict(color='white'),
                     marker=dict(symbol='diamond', size=28, color='#7c3aed', line=dict(color='white', width=1)),
-                    hoverinfo='text', hovertext=ms_act.apply(lambda r: f"{r['Gateway']}: {r['Date']}", axis=1)
+                    hoverinfo='text', hovertext=ms_act['Hover']
                 ))
 
-        # Enforce the custom order on Y-axis
-        fig_gantt.update_layout(yaxis={'categoryorder':'array', 'categoryarray': task_order})
-        fig_gantt.update_yaxes(autorange="reversed") 
+        # Enforce the custom order on Y-axis (first project on top)
+        fig_gantt.update_yaxes(
+            tickmode='array', tickvals=list(range(len(task_order))), ticktext=task_order,
+            range=[visible_rows - 0.5, -0.5], zeroline=False
+        )
         fig_gantt.update_layout(
-            height=600 + (len(projects) * 30), # Dynamic Height
+            height=GANTT_HEIGHT,
+            dragmode='pan',
+            uirevision='gantt', # Keep the user's pan/zoom across reruns
+            legend_title_text="Resource",
             xaxis=dict(
+                type="date",
                 title="Timeline",
                 showgrid=True,
                 gridwidth=1,
@@ -851,515 +1013,172 @@ elif st.session_state.view == "Detailed Project View":
         if st.button("📂 Upload Bulk Data", use_container_width=True):
              modal_upload_csv()
 
-
-
-        
-
-    
-
-
-
-    
-    st.divider()
-
-    st.divider()
-
-    # --- Header Row (Matches Image) ---
-    h1, h2, h3, h4, h5, h6, h7 = st.columns([2, 0.8, 1, 1, 1, 1, 1])
-    h1.markdown("**COMPONENT NAME**")
-    h2.markdown("**TYPE**")
-    h3.markdown("**D0 (CONCEPT)**")
-    h4.markdown("**D1 (PROTO)**")
-    h5.markdown("**D2 (PILOT)**")
-    h6.markdown("**D3 (LAUNCH)**")
-    h7.markdown("**D4 (CLOSE)**")
     st.divider()
 
     # --- Project Rows (Tree Structure) ---
-    # Helper for Dates
-    def parse_date(d_str):
-        if not d_str: return None
-        try: return datetime.strptime(d_str, "%Y-%m-%d").date()
-        except: return None
-
+    gws = utils.GATEWAYS
+    gw_titles = ["D0 (CONCEPT)", "D1 (PROTO)", "D2 (PILOT)", "D3 (LAUNCH)", "D4 (CLOSE)"]
+    
+    # One data_editor per project (Project -> Modules -> Sub-modules rows) instead of per-cell widgets
+    tree_config = {
+        "Level": st.column_config.TextColumn("Level", disabled=True, width="small"),
+        "Name": st.column_config.TextColumn("Component Name", width="medium")
+    }
+    for gw, title in zip(gws, gw_titles):
+        tree_config[f"{gw}_s"] = st.column_config.TextColumn(title, disabled=True, width="small")
+        tree_config[f"{gw}_p"] = st.column_config.DateColumn(f"{gw} Plan", help="Project rows only", format="YYYY-MM-DD")
+        tree_config[f"{gw}_a"] = st.column_config.DateColumn(f"{gw} Act", help="Projects (and modules with sub-modules) roll up automatically", format="YYYY-MM-DD")
+        tree_config[f"{gw}_ecn"] = st.column_config.TextColumn(f"{gw} ECN", help="Module / sub-module rows only")
+    
+    if 'tree_rev' not in st.session_state:
+        st.session_state.tree_rev = 0
+    
+    # Focused gateway: only its date/ECN inputs go into the editors (status icons stay for all gateways)
+    focus_gw = st.segmented_control(
+        "Edit Gateways", ("All",) + gws, default="All", required=True,
+        key="detail_focus_gw", label_visibility="collapsed"
+    )
+    edit_gws = gws if focus_gw == "All" else (focus_gw,)
+    
+    # Structural edits set this instead of saving + rerunning inline, so a run writes the DB at most once
+    rerun_after_save = False
     for p in filtered_projects:
         # Project level expander (Mockup shows Project A with dropdown caret)
         with st.expander(f"**{p['name']}**", expanded=True):
             
-            # --- Project Level Inputs (Row 1) ---
-            pc1, pc2, pc3, pc4, pc5, pc6, pc7 = st.columns([2, 0.8, 1, 1, 1, 1, 1])
-            
-            # Project Name + Actions
+            # --- Project Header: [Name | Add | Del | Type] ---
+            pc1, pc2, pc3, pc4 = st.columns([3, 1.2, 0.4, 1])
             with pc1:
-                # Flattened nesting: [Name | Add | Del]
-                pnc1, pnc2, pnc3 = st.columns([3, 2, 0.6])
-                with pnc1:
-                    st.markdown(f"<h2 style='color:#4f46e5; margin:0; padding:0;'>{p['name']}</h2>", unsafe_allow_html=True)
-                with pnc2:
-                    st.write("") 
-                    if st.button("➕ Add Modules", key=f"add_mod_top_{p['id']}", type="primary", use_container_width=True):
-                        if 'modules' not in p: p['modules'] = []
-                        new_mod_id = int(datetime.now().timestamp() * 1000)
-                        defaults = { "p": "", "a": "", "ecn": "" }
-                        p['modules'].append({
-                            "id": new_mod_id, "name": "New Module",
-                            "gateways": { "D0": defaults.copy(), "D1": defaults.copy(), "D2": defaults.copy(), "D3": defaults.copy(), "D4": defaults.copy() }
-                        })
-                        utils.save_data(projects)
-                        st.rerun()
-                with pnc3:
-                    st.write("")
-                    if st.button("🗑️", key=f"del_proj_{p['id']}", help="Delete Project"): # Project Delete
-                        projects.remove(p)
-                        utils.save_data(projects)
-                        st.rerun()
-
-
-            # Type Dropdown
+                st.markdown(f"<h2 style='color:#4f46e5; margin:0; padding:0;'>{p['name']}</h2>", unsafe_allow_html=True)
             with pc2:
+                if st.button("➕ Add Modules", key=f"add_mod_top_{p['id']}", type="primary", use_container_width=True):
+                    if 'modules' not in p: p['modules'] = []
+                    new_mod_id = utils.new_id()
+                    p['modules'].append({
+                        "id": new_mod_id, "name": "New Module",
+                        "gateways": empty_gateways()
+                    })
+                    mark_dirty()
+                    rerun_after_save = True
+            with pc3:
+                if st.button("🗑️", key=f"del_proj_{p['id']}", help="Delete Project"): # Project Delete
+                    projects.remove(p)
+                    mark_dirty()
+                    rerun_after_save = True
+            with pc4:
                 curr_type = p.get('type')
                 new_type_sel = st.selectbox("Type", ["Major", "Minor", "Carryover"], index=["Major", "Minor", "Carryover"].index(curr_type) if curr_type in ["Major", "Minor", "Carryover"] else 0, key=f"p_type_{p['id']}", label_visibility="collapsed")
                 if new_type_sel != curr_type:
                     p['type'] = new_type_sel
-                    utils.save_data(projects)
+                    mark_dirty()
             
-            # Plan Dates
-            gw_cols = [pc3, pc4, pc5, pc6, pc7]
-            gws = ['D0', 'D1', 'D2', 'D3', 'D4']
+            # --- Rollups (Module Actual = latest Sub-module Actual, Project Actual = latest Module Actual) ---
+            # One pass per level via utils.latest_actuals (no parsing: ISO strings sort chronologically)
+            modules = p.get('modules') or []
+            for m in modules:
+                if m.get('sub_modules'):
+                    for gw, sub_latest in utils.latest_actuals(m['sub_modules']).items():
+                        if sub_latest and m['gateways'].setdefault(gw, {}).get('a') != sub_latest:
+                            m['gateways'][gw]['a'] = sub_latest
+                            mark_dirty()
+            # No modules -> nothing to scan, Project Actuals are simply cleared
+            proj_latest = utils.latest_actuals(modules) if modules else dict.fromkeys(gws, "")
+            for gw in gws:
+                if p['gateways'].setdefault(gw, {'p': '', 'a': ''}).get('a') != proj_latest[gw]:
+                    p['gateways'][gw]['a'] = proj_latest[gw]
+                    mark_dirty()
             
-            # Helper for status colors
-            s_cols_hex = { "green": "#10b981", "yellow": "#f59e0b", "red": "#ef4444", "grey": "#e5e7eb" }
-
-            for i, gw in enumerate(gws):
-                curr_p = p['gateways'][gw].get('p')
-                pd_val = parse_date(curr_p)
-                
-                with gw_cols[i]:
-                    # 1. Plan Input
-                    new_pd = st.date_input("Plan", value=pd_val, key=f"pp_{p['id']}_{gw}", label_visibility="collapsed")
-                    if str(new_pd) != curr_p and new_pd:
-                        p['gateways'][gw]['p'] = str(new_pd)
-                        utils.save_data(projects)
-                    
-                    st.write("") # Spacer
-
-                    # 2. Project Actual Calculation (Rollup)
-                    # Iterate modules to find max actual date for this gateway
-                    proj_a_str = ""
-                    if 'modules' in p and p['modules']:
-                        m_dates = []
-                        for m in p['modules']:
-                            # Ensure we use the latest specific entry from module
-                            ma = m['gateways'].get(gw, {}).get('a')
-                            if ma:
-                                try: m_dates.append(datetime.strptime(ma, "%Y-%m-%d").date())
-                                except: pass
-                        if m_dates:
-                            proj_a_str = str(max(m_dates))
-                    
-                    # Update Project Data if changed
-                    if p['gateways'][gw].get('a') != proj_a_str:
-                        p['gateways'][gw]['a'] = proj_a_str
-                        utils.save_data(projects)
-                    
-                    # 3. Project Actual Card (Render)
-                    # Status based on Project Plan vs Project Actual
-                    proj_status = utils.get_status(curr_p, proj_a_str) if curr_p else "grey"
-                    if not proj_a_str: proj_status = "grey" # Default if no actuals yet
-
-                    p_curr_col = s_cols_hex.get(proj_status, "#e5e7eb")
-                    
-                    # Interactive Card (Read Only primarily, but shows date)
-                    with st.container(border=True):
-                         # Top Color Bar
-                         st.markdown(f"<div style='height: 5px; background-color: {p_curr_col}; margin: -15px -15px 10px -15px; border-radius: 4px 4px 0 0;'></div>", unsafe_allow_html=True)
-                         
-                         # Label
-                         st.markdown(f"<div style='font-size:0.75em; font-weight:800; color:{p_curr_col if proj_status != 'grey' else '#6b7280'};'>ACT (Proj)</div>", unsafe_allow_html=True)
-                         
-                         # Date Display (Disabled/Read-Only logic)
-                         pa_val = parse_date(proj_a_str)
-                         st.date_input("Act", value=pa_val, key=f"p_act_{p['id']}_{gw}", label_visibility="collapsed", disabled=True)
-
-            st.write("") 
-
-            # --- Module Rows ---
-            if 'modules' in p:
-                for m_idx, m in enumerate(p['modules']):
-                    mc1, mc2, mc3, mc4, mc5, mc6, mc7 = st.columns([2, 0.8, 1, 1, 1, 1, 1])
-                    
-                    with mc1: # Name + Sub Button
-                        st.markdown(f"<div style='font-weight:600; color:#1e3a8a; margin-left: 10px; margin-top:20px;'>↳ {m['name']}</div>", unsafe_allow_html=True)
-                        if st.button("➕ Sub", key=f"add_sub_btn_{m['id']}", help="Add Sub-module"):
-                            if 'sub_modules' not in m: m['sub_modules'] = []
-                            new_sub_id = int(datetime.now().timestamp() * 1000)
-                            defaults = { "p": "", "a": "", "ecn": "" }
-                            m['sub_modules'].append({
-                                "id": new_sub_id, "name": "New Part",
-                                "gateways": { "D0": defaults.copy(), "D1": defaults.copy(), "D2": defaults.copy(), "D3": defaults.copy(), "D4": defaults.copy() }
-                            })
-                            utils.save_data(projects)
-                            st.rerun()
-                    
-                    with mc2: # Module Delete
-                        st.write("")
-                        st.write("")
-                        if st.button("🗑️", key=f"del_mod_{m['id']}", help="Delete Module"):
-                            p['modules'].pop(m_idx)
-                            utils.save_data(projects)
-                            st.rerun()
-
-                    # Gateways
-                    mod_cols = [mc3, mc4, mc5, mc6, mc7]
-                    has_subs = bool(m.get('sub_modules'))
-                    
-                    for i, gw in enumerate(gws):
-                        gw_data = m['gateways'].get(gw, {})
-                        p_date = p['gateways'].get(gw, {}).get('p')
-                        a_date = gw_data.get('a')
-                        
-                        # Rollup Logic
-                        if has_subs:
-                            sub_dates = []
-                            for s in m['sub_modules']:
-                                s_a = s['gateways'].get(gw, {}).get('a')
-                                if s_a:
-                                    try: sub_dates.append(datetime.strptime(s_a, "%Y-%m-%d").date())
-                                    except: pass
-                            if sub_dates:
-                                max_date = max(sub_dates)
-                                a_date = str(max_date)
-                                if m['gateways'][gw].get('a') != a_date:
-                                    m['gateways'][gw]['a'] = a_date
-                                    utils.save_data(projects)
-                        
-                        status = utils.get_status(p_date, a_date)
-                        
-                        # Status Colors definition
-                        s_cols_hex = { "green": "#10b981", "yellow": "#f59e0b", "red": "#ef4444", "grey": "#e5e7eb" }
-                        curr_col = s_cols_hex.get(status, "#e5e7eb")
-
-                        with mod_cols[i]:
-                            # Container with Custom Status Bar
-                            with st.container(border=True):
-                                # Top Color Bar
-                                st.markdown(f"<div style='height: 5px; background-color: {curr_col}; margin: -15px -15px 10px -15px; border-radius: 4px 4px 0 0;'></div>", unsafe_allow_html=True)
-                                
-                                # Label
-                                st.markdown(f"<div style='font-size:0.75em; font-weight:800; color: {curr_col if status != 'grey' else '#6b7280'};'>ACT (Mod)</div>", unsafe_allow_html=True)
-                                
-                                act_val = parse_date(a_date)
-                                new_act = st.date_input("Act", value=act_val, key=f"m_{m['id']}_{gw}_a", label_visibility="collapsed", disabled=has_subs)
-                                if not has_subs:
-                                    if str(new_act) != str(a_date) if a_date else (new_act is not None):
-                                        m['gateways'][gw]['a'] = str(new_act) if new_act else ""
-                                        utils.save_data(projects)
-                                
-                                st.markdown(f"<div style='font-size:0.7em; font-weight:bold; margin-top:4px;'>ECN</div>", unsafe_allow_html=True)
-                                ecn_val = gw_data.get('ecn', "")
-                                new_ecn = st.text_input("ECN", value=ecn_val, key=f"m_{m['id']}_{gw}_ecn", label_visibility="collapsed")
-                                if new_ecn != ecn_val:
-                                    m['gateways'][gw]['ecn'] = new_ecn
-                                    utils.save_data(projects)
-
-                    # Sub-modules
-                    if has_subs:
-                        for s_idx, s in enumerate(m['sub_modules']):
-                            sc1, sc2, sc3, sc4, sc5, sc6, sc7 = st.columns([2, 0.8, 1, 1, 1, 1, 1])
-                            with sc1:
-                                st.markdown(f"<div style='color:#64748b; margin-left: 25px; font-size:0.9em;'>↳ {s['name']}</div>", unsafe_allow_html=True)
-                                new_s_name = st.text_input("Edit", value=s['name'], key=f"s_name_{s['id']}", label_visibility="collapsed")
-                                if new_s_name != s['name']:
-                                    s['name'] = new_s_name
-                                    utils.save_data(projects)
-                            
-                            with sc2: # Sub Delete
-                                if st.button("🗑️", key=f"del_sub_{s['id']}"):
-                                    m['sub_modules'].pop(s_idx)
-                                    utils.save_data(projects)
-                                    st.rerun()
-
-                            sub_cols = [sc3, sc4, sc5, sc6, sc7]
-                            for i, gw in enumerate(gws):
-                                sgw_data = s['gateways'].get(gw, {})
-                                p_date = p['gateways'].get(gw, {}).get('p')
-                                sa_date = sgw_data.get('a')
-                                s_status = utils.get_status(p_date, sa_date)
-                                
-                                with sub_cols[i]:
-                                    s_curr_col = s_cols_hex.get(s_status, "#e5e7eb")
-                                    with st.container(border=True):
-                                         # Top Color Bar
-                                         st.markdown(f"<div style='height: 5px; background-color: {s_curr_col}; margin: -15px -15px 10px -15px; border-radius: 4px 4px 0 0;'></div>", unsafe_allow_html=True)
-                                         
-                                         # Label
-                                         st.markdown(f"<div style='font-size:0.7em; font-weight:800; color:{s_curr_col if s_status != 'grey' else '#6b7280'};'>ACT (Sub)</div>", unsafe_allow_html=True)
-                                         
-                                         s_act_val = parse_date(sa_date)
-                                         s_new_act = st.date_input("Act", value=s_act_val, key=f"s_{s['id']}_{gw}_a", label_visibility="collapsed")
-                                         if str(s_new_act) != str(sa_date) if sa_date else (s_new_act is not None):
-                                             s['gateways'][gw]['a'] = str(s_new_act) if s_new_act else ""
-                                             utils.save_data(projects)
-                                             st.rerun()
-                                         
-                                         s_new_ecn = st.text_input("ECN", value=sgw_data.get('ecn', ""), key=f"s_{s['id']}_{gw}_ecn", label_visibility="collapsed")
-                                         if s_new_ecn != sgw_data.get('ecn', ""):
-                                             s['gateways'][gw]['ecn'] = s_new_ecn
-                                             utils.save_data(projects)
-
-    # Footer Removed (Merged into Header)
-
-
-
-
-
-    # Legacy Loop Disabled
-    if False:
-        p = None
-        # Filter applied via filtered_projects list
-        
-        with st.container(border=True):
-            # Custom Header Row within Container
-            row_head_1, row_head_2 = st.columns([0.95, 0.05])
-            with row_head_1:
-                 # Bigger Project Name
-                 st.markdown(f"### {p['name']}")
-            with row_head_2:
-                 # Settings Icon Only
-                 show_settings = st.checkbox("⚙️", key=f"show_set_{p['id']}", label_visibility="visible")
-            
-            # Settings Panel (Conditional Display)
-            if show_settings:
-                with st.container():
-                    st.markdown("#### Project Settings")
-                    ps_c1, ps_c2 = st.columns([3, 1])
-                    with ps_c1:
-                       new_p_name = st.text_input("Edit Project Name", value=p['name'], key=f"p_name_edit_{p['id']}")
-                       if new_p_name != p['name']:
-                           p['name'] = new_p_name
-                           utils.save_data(projects)
-                           st.rerun()
-                    with ps_c2:
-                        st.write("") # Spacer
-                        st.write("") 
-                        if st.button("🗑️ Delete Project", key=f"del_proj_{p['id']}", type="primary"):
-                            projects.remove(p)
-                            utils.save_data(projects)
-                            st.rerun()
-                st.divider()
-
-            # Project Plan Data Row
-            pc1, pc2, pc3, pc4, pc5, pc6, pc7 = st.columns([2, 1, 1, 1, 1, 1, 1])
-            pc2.caption(p.get('type'))
-
-            # Helper to safely parse date or return None
-            def parse_date(d_str):
-                if not d_str: return None
-                try: return datetime.strptime(d_str, "%Y-%m-%d").date()
-                except: return None
-            
-            # Project Gateways Inputs
-            with pc3:
-                curr_p = p['gateways']['D0'].get('p')
-                new_d0 = st.date_input("Plan", value=parse_date(curr_p), key=f"p_{p['id']}_D0", label_visibility="collapsed")
-                if str(new_d0) != curr_p and new_d0 is not None:
-                     p['gateways']['D0']['p'] = str(new_d0)
-                     utils.save_data(projects) # Auto-save (naive)
-
-            with pc4:
-                curr_p = p['gateways']['D1'].get('p')
-                new_d1 = st.date_input("Plan", value=parse_date(curr_p), key=f"p_{p['id']}_D1", label_visibility="collapsed")
-                if str(new_d1) != curr_p and new_d1 is not None:
-                     p['gateways']['D1']['p'] = str(new_d1)
-                     utils.save_data(projects)
-
-            with pc5:
-                curr_p = p['gateways']['D2'].get('p')
-                new_d2 = st.date_input("Plan", value=parse_date(curr_p), key=f"p_{p['id']}_D2", label_visibility="collapsed")
-                if str(new_d2) != curr_p and new_d2 is not None:
-                     p['gateways']['D2']['p'] = str(new_d2)
-                     utils.save_data(projects)
-
-            with pc6:
-                curr_p = p['gateways']['D3'].get('p')
-                new_d3 = st.date_input("Plan", value=parse_date(curr_p), key=f"p_{p['id']}_D3", label_visibility="collapsed")
-                if str(new_d3) != curr_p and new_d3 is not None:
-                     p['gateways']['D3']['p'] = str(new_d3)
-                     utils.save_data(projects)
-
-            with pc7:
-                curr_p = p['gateways']['D4'].get('p')
-                new_d4 = st.date_input("Plan", value=parse_date(curr_p), key=f"p_{p['id']}_D4", label_visibility="collapsed")
-                if str(new_d4) != curr_p and new_d4 is not None:
-                     p['gateways']['D4']['p'] = str(new_d4)
-                     utils.save_data(projects)
+            # --- Tree Rows (same order as tree_frame) ---
+            nodes = [("project", p, None)]
+            for m in p.get('modules') or []:
+                nodes.append(("module", m, p['modules']))
+                nodes += [("sub", s, m['sub_modules']) for s in m.get('sub_modules') or []]
             
+            tree_key = f"tree_{p['id']}_{focus_gw}_{st.session_state.tree_rev}"
+            # Unsaved in-place edits this pass (e.g. a rollup) aren't in the loaded version: build uncached
+            if st.session_state.get('_dirty'):
+                tree_df = tree_frame(p, edit_gws)
+            else:
+                tree_df = build_tree_frame(p['id'], st.session_state.projects_version, edit_gws, p)
+            st.data_editor(
+                tree_df,
+                column_config=tree_config,
+                hide_index=True,
+                use_container_width=True,
+                num_rows="delete",
+                key=tree_key
+            )
             
-            st.markdown("---")
-
-            st.markdown("---")
+            # --- Apply Edits (only the changed cells reported by the editor) ---
+            tree_delta = st.session_state[tree_key]
+            if tree_delta['edited_rows'] or tree_delta['deleted_rows']:
+                # Values are normalized to the stored strings first, so re-entering a value is not a change
+                tree_changed = False
+                for pos, changes in tree_delta['edited_rows'].items():
+                    kind, node, _ = nodes[int(pos)]
+                    for col, val in changes.items():
+                        if col == "Name":
+                            if val and val != node['name']:
+                                node['name'] = val
+                                tree_changed = True
+                            continue
+                        gw, field = col.split("_", 1)
+                        gw_data = node['gateways'].setdefault(gw, {})
+                        if field == "p" and kind == "project" and val:
+                            new_val = str(val)[:10]
+                        elif field == "a" and (kind == "sub" or (kind == "module" and not node.get('sub_modules'))):
+                            new_val = str(val)[:10] if val else ""
+                        elif field == "ecn" and kind != "project":
+                            new_val = (val or "").strip()
+                        else:
+                            continue
+                        if gw_data.get(field, "") != new_val:
+                            gw_data[field] = new_val
+                            tree_changed = True
+                
+                # Deleted rows: the Project row (position 0) deletes the project, same as 🗑️ above;
+                # otherwise Modules / Sub-modules
+                if 0 in map(int, tree_delta['deleted_rows']):
+                    projects.remove(p)
+                    tree_changed = True
+                else:
+                    for pos in tree_delta['deleted_rows']:
+                        kind, node, parent = nodes[int(pos)]
+                        parent[:] = [x for x in parent if x is not node]
+                        tree_changed = True
+                
+                if tree_changed:
+                    # Fresh editor state: positional edits must not be replayed onto the rebuilt rows
+                    st.session_state.tree_rev += 1
+                    mark_dirty()
+                    rerun_after_save = True
             
-            # Modules
-            if 'modules' in p:
-                for m_idx, m in enumerate(p['modules']):
-                    mc1, mc2, mc3, mc4, mc5, mc6, mc7 = st.columns([2, 1, 1, 1, 1, 1, 1])
-                    
-                    mac1, mac2 = mc1.columns([4, 1])
-                    with mac1:
-                        st.write("") # Spacer
-                        st.caption("Module")
-                        new_name = st.text_input("Name", value=m['name'], key=f"m_name_{m['id']}", label_visibility="collapsed")
-                        if new_name != m['name']:
-                            m['name'] = new_name
-                            utils.save_data(projects)
-                    
-                    with mac2:
-                        st.write("")
-                        st.write("")
-                        if st.button("🗑️", key=f"del_mod_{m['id']}"):
-                            p['modules'].pop(m_idx)
-                            utils.save_data(projects)
-                            st.rerun()
-                    
-                    gw_cols = [mc3, mc4, mc5, mc6, mc7]
-                    gws = ['D0', 'D1', 'D2', 'D3', 'D4']
-                    
-                    for i, gw in enumerate(gws):
-                        col = gw_cols[i]
-                        gw_data = m['gateways'].get(gw, {})
-                        
-                        gw_status = utils.get_status(p['gateways'].get(gw, {}).get('p'), gw_data.get('a'))
-                        
-                        # Use markdown for "Card" like feel or Status header
-                        # Using emoji is cleanest, or color text
-                        status_color_css = {
-                            "green": "color: #10b981", 
-                            "yellow": "color: #f59e0b", 
-                            "red": "color: #f43f5e", 
-                            "grey": "color: #94a3b8"
-                        }
-                        
-                        with col:
-                            with st.container(border=True):
-                                st.markdown(f"<div style='font-size:0.8em; font-weight:bold; {status_color_css[gw_status]}'>{gw} Status</div>", unsafe_allow_html=True)
-                                
-                                has_subs = bool(m.get('sub_modules'))
-                                
-                                act_val = parse_date(gw_data.get('a'))
-                                st.caption("ACT")
-                                new_act = st.date_input("Act", value=act_val, key=f"m_{m['id']}_{gw}_a", label_visibility="collapsed", disabled=has_subs)
-                                
-                                if has_subs:
-                                    # Show info tooltip or just locked icon? 
-                                    # Using disabled is enough
-                                    pass
-                                
-                                ecn_val = gw_data.get('ecn', '')
-                                st.caption("ECN")
-                                new_ecn = st.text_input("ECN", value=ecn_val, placeholder="-", key=f"m_{m['id']}_{gw}_ecn", label_visibility="collapsed")
-                                
-                                # Update Logic
-                                # Allow clearing: if new_act is None, we save empty string
-                                if not has_subs:
-                                    if new_act != act_val:
-                                        clean_new = str(new_act) if new_act else ""
-                                        gw_data['a'] = clean_new
-                                        utils.save_data(projects)
-                                
-                                # Note: if has_subs is True, the input is disabled, so user can't change it.
-                                # The rollup logic in utils.py will overwrite it anyway on save.
-                                        
-                                if new_ecn != ecn_val:
-                                    gw_data['ecn'] = new_ecn
-                                    utils.save_data(projects)
-                                    
-                            if new_ecn != ecn_val:
-                                gw_data['ecn'] = new_ecn
-                                utils.save_data(projects)
-                                
-                    # --- Sub-modules Logic ---
-                    sub_mods = m.get('sub_modules', [])
-                    for s_idx, s in enumerate(sub_mods):
-                        sc1, sc2, sc3, sc4, sc5, sc6, sc7 = st.columns([2, 1, 1, 1, 1, 1, 1])
-                        with sc1:
-                            st.write("") 
-                            st.caption("Sub-module")
-                            # Visual indentation
-                            c_name, c_del = st.columns([4, 1])
-                            with c_name:
-                                s_name = st.text_input("Name", value=s['name'], key=f"s_name_{s['id']}", label_visibility="collapsed")
-                            with c_del:
-                                if st.button("🗑️", key=f"del_s_{s['id']}"):
-                                    m['sub_modules'].pop(s_idx)
-                                    utils.save_data(projects)
-                                    st.rerun()
-
-                            st.markdown("<span style='color:grey; font-size:0.8em'>↳ Nested</span>", unsafe_allow_html=True)
-                            
-                            if s_name != s['name']:
-                                s['name'] = s_name
-                                utils.save_data(projects)
-
-                        s_gw_cols = [sc3, sc4, sc5, sc6, sc7]
-                        for i, gw in enumerate(gws):
-                            col = s_gw_cols[i]
-                            gw_data = s['gateways'].get(gw, {})
-                            
-                            # Inherit Project Plan for Status comparison (or should it be independent? Using Project plan for now)
-                            gw_status = utils.get_status(p['gateways'].get(gw, {}).get('p'), gw_data.get('a'))
-                            
-                            with col:
-                                with st.container(border=True):
-                                    st.markdown(f"<div style='font-size:0.7em; color:grey'>{gw} (Sub)</div>", unsafe_allow_html=True)
-                                    
-                                    act_val = parse_date(gw_data.get('a'))
-                                    new_act = st.date_input("Act", value=act_val, key=f"s_{s['id']}_{gw}_a", label_visibility="collapsed")
-                                    
-                                    ecn_val = gw_data.get('ecn', '')
-                                    new_ecn = st.text_input("ECN", value=ecn_val, placeholder="-", key=f"s_{s['id']}_{gw}_ecn", label_visibility="collapsed")
-                                    
-                                    # Allow clearing date
-                                    if new_act != act_val:
-                                        clean_new = str(new_act) if new_act else ""
-                                        gw_data['a'] = clean_new
-                                        utils.save_data(projects)
-                                            
-                                    if new_ecn != ecn_val:
-                                        gw_data['ecn'] = new_ecn
-                                        utils.save_data(projects)
-                        st.divider()
-
-                    # Add Sub-module Button
-                    if st.button(f"➕ Add Sub-module to {m['name']}", key=f"add_sub_{m['id']}"):
-                        if 'sub_modules' not in m:
-                            m['sub_modules'] = []
-                        
-                        defaults = { "p": "", "a": "", "ecn": "" }
-                        new_sub_id = int(datetime.now().timestamp() * 1000) + 999 
+            # --- Add Sub-module ---
+            if p.get('modules'):
+                sc1, sc2 = st.columns([3, 1])
+                with sc1:
+                    mod_names = [m['name'] for m in p['modules']]
+                    sub_parent = st.selectbox("Add sub-module to", range(len(mod_names)), format_func=mod_names.__getitem__, key=f"add_sub_sel_{p['id']}", label_visibility="collapsed")
+                with sc2:
+                    if st.button("➕ Sub", key=f"add_sub_btn_{p['id']}", help="Add Sub-module", use_container_width=True):
+                        m = p['modules'][sub_parent]
+                        if 'sub_modules' not in m: m['sub_modules'] = []
+                        new_sub_id = utils.new_id()
                         m['sub_modules'].append({
-                            "id": new_sub_id,
-                            "name": "New Part",
-                            "gateways": { "D0": defaults.copy(), "D1": defaults.copy(), "D2": defaults.copy(), "D3": defaults.copy(), "D4": defaults.copy() }
+                            "id": new_sub_id, "name": "New Part",
+                            "gateways": empty_gateways()
                         })
-                        utils.save_data(projects)
-                        st.rerun()
-
-                    st.divider() 
-            else:
-                st.info("No modules added.")
-                
-            if st.button("➕ Add Module", key=f"add_mod_{p['id']}"):
-                defaults = { "p": "", "a": "", "ecn": "" }
-                new_mod_id = int(datetime.now().timestamp() * 1000)
-                p['modules'].append({
-                    "id": new_mod_id,
-                    "name": "New Module",
-                    "gateways": { "D0": defaults.copy(), "D1": defaults.copy(), "D2": defaults.copy(), "D3": defaults.copy(), "D4": defaults.copy() }
-                })
-                utils.save_data(projects)
-                st.rerun()
-
+                        mark_dirty()
+                        rerun_after_save = True
+
+    # Persist all edits from this render pass in one write
+    # Only the projects shown here can have changed; the rest were rolled up when loaded/saved
+    if st.session_state.pop('_dirty', False):
+        save_projects(projects, dirty={p['id'] for p in filtered_projects})
+    if rerun_after_save:
+        st.rerun()
 
+    # Footer Removed (Merged into Header)
 
 elif st.session_state.view == "Deliverables Tracker":
     st.title("📋 Project Deliverables Checker")
@@ -1389,8 +1208,8 @@ elif st.session_state.view == "Deliverables Tracker":
                     selected_project['deliverables'] = []
                     # 2. Reload from utils (which reads fresh CSV)
                     selected_project['deliverables'] = utils.populate_deliverables(selected_project['id'], selected_project.get('type'))
-                    # 3. Save
-                    if utils.save_data(projects):
+                    # 3. Save (deliverables only: no gateway rollup needed)
+                    if save_projects(projects, dirty=()):
                         st.success("Deliverables list has been reset to the latest standard.")
                         st.rerun()
                     else:
@@ -1406,7 +1225,6 @@ elif st.session_state.view == "Deliverables Tracker":
                 st.session_state.deliv_active_gw = 'D0'
 
             st.markdown("###")
-            cols = st.columns(5)
             gateways = {
                 'D0': 'D0 Concept', 
                 'D1': 'D1 Proto', 
@@ -1415,17 +1233,11 @@ elif st.session_state.view == "Deliverables Tracker":
                 'D4': 'D4 Close'
             }
             
-            for i, (gw_key, gw_label) in enumerate(gateways.items()):
-                # Highlight active button
-                if st.session_state.deliv_active_gw == gw_key:
-                    if cols[i].button(f"🔵 {gw_label}", key=f"btn_{gw_key}", use_container_width=True):
-                        pass # Already active
-                else:
-                    if cols[i].button(gw_label, key=f"btn_{gw_key}", use_container_width=True):
-                        st.session_state.deliv_active_gw = gw_key
-                        st.rerun()
-            
-            active_gw = st.session_state.deliv_active_gw
+            # One segmented control bound to deliv_active_gw (highlights the active tile, no forced rerun)
+            active_gw = st.segmented_control(
+                "Gateway", list(gateways), format_func=gateways.__getitem__, required=True,
+                key="deliv_active_gw", label_visibility="collapsed", width="stretch"
+            )
             active_label = gateways[active_gw]
             
             # --- Main Content Card ---
@@ -1437,60 +1249,14 @@ elif st.session_state.view == "Deliverables Tracker":
                 if not gw_delivs:
                     st.info(f"No deliverables checklist for {active_gw}.")
                 else:
-                    # Progress
-                    comp_count = len([d for d in gw_delivs if d['status'] == 'Completed' or d['status'] == 'NA'])
-                    prog = comp_count / len(gw_delivs)
-                    st.progress(prog, text=f"{int(prog*100)}% Completed")
+                    df = build_checklist_frame(json.dumps(gw_delivs))
                     
-                    df = pd.DataFrame(gw_delivs)
-                    
-                    # CSS: Card Style + Big Table Fonts + Hide Toolbar
-                    st.markdown("""
-                    <style>
-                    /* Increase Font Size for Data Editor */
-                    div[data-testid="stDataEditor"] table {
-                        font-size: 22px !important;
-                    }
-                    div[data-testid="stDataEditor"] td {
-                        font-size: 22px !important;
-                        height: 75px !important; /* Increased Height */
-                        padding-top: 15px !important;
-                        padding-bottom: 15px !important;
-                    }
-                    div[data-testid="stDataEditor"] th {
-                        font-size: 22px !important;
-                        height: 75px !important; /* Increased Height */
-                    }
-                    /* Attempts to target internal grid if table css fails */
-                    div[class*="stDataFrame"] {
-                        font-size: 22px !important;
-                    }
-                    /* Hide Streamlit Toolbar (Zoom/Fullscreen) on DataFrame/DataEditor */
-                    div[data-testid="stElementToolbar"] {
-                        display: none !important;
-                    }
-                    button[title="View fullscreen"] {
-                        display: none !important;
-                    }
-                    </style>
-                    """, unsafe_allow_html=True)
-                    
-                    # Status Mapping (Logic for Colors)
-                    status_map = {
-                        "Completed": "🟢 Completed",
-                        "WIP": "🟡 WIP",
-                        "Pending": "🔴 Pending",
-                        "NA": "⚪ NA"
-                    }
-                    # Reverse map for saving
-                    rev_status_map = {v: k for k, v in status_map.items()}
-                    
-                    # Apply mapping to DF for display
-                    if 'status' in df.columns:
-                        df['status'] = df['status'].map(lambda x: status_map.get(x, x))
+                    # Progress (counted on the editor frame's status labels)
+                    prog = df['status'].isin((DELIV_STATUS_LABELS['Completed'], DELIV_STATUS_LABELS['NA'])).mean()
+                    st.progress(prog, text=f"{int(prog*100)}% Completed")
 
-                    # Container style wrapper
-                    with st.container(border=True):
+                    # Container style wrapper (keyed so the checklist rules in CUSTOM_CSS apply only here)
+                    with st.container(border=True, key="deliv_card"):
                         edit_df = st.data_editor(
                             df,
                             column_config={
@@ -1513,11 +1279,13 @@ elif st.session_state.view == "Deliverables Tracker":
                     
                         # Save Logic
                         has_changes = False
-                        for index, row in edit_df.iterrows():
+                        # Editor rows come from gw_delivs, so index just those by id (one dict lookup per row)
+                        by_id = {d['id']: d for d in gw_delivs}
+                        for row in edit_df.to_dict('records'):
                             # Clean status back to plain text
-                            clean_status = rev_status_map.get(row['status'], row['status'])
+                            clean_status = DELIV_STATUS_VALUES.get(row['status'], row['status'])
                             
-                            orig = next((d for d in all_delivs if d['id'] == row['id']), None)
+                            orig = by_id.get(row['id'])
                             if orig:
                                 if (orig['status'] != clean_status or orig['evidence_link'] != row['evidence_link'] or orig['remarks'] != row['remarks']):
                                     orig['status'] = clean_status
@@ -1526,5 +1294,5 @@ elif st.session_state.view == "Deliverables Tracker":
                                     has_changes = True
                         
                         if has_changes:
-                            if utils.save_data(projects):
+                            if save_projects(projects, dirty=()):
                                 st.toast(f"Saved changes for {active_gw}!", icon="✅")
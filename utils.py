@@ -1,21 +1,146 @@
+import atexit
+import csv
+import functools
+import io
 import json
 import os
 import sqlite3
+import numpy as np
 import pandas as pd
-from datetime import datetime
-import random
-import shutil
-import glob
+from openpyxl import Workbook
+from datetime import date, datetime
+import threading
+import time
 
 DB_FILE = os.path.join(os.path.dirname(__file__), 'project_tracker.db')
 BACKUP_DIR = os.path.join(os.path.dirname(__file__), 'backups')
+CHECKLIST_CSV = os.path.join(os.path.dirname(__file__), 'master_gateway_checklist.csv')
 
+GATEWAYS = ('D0', 'D1', 'D2', 'D3', 'D4')
+RISK_THRESHOLD_DAYS = 30 # Delay beyond this (days) is Critical instead of At Risk
+STATUS_NAMES = ('green', 'yellow', 'red', 'grey') # classify_status codes 0-3
+# (gateway, plan column, actual column, ECN column) in the CSV import/export layout
+GATEWAY_COLS = tuple((gw, f"P_{gw}", f"{gw}_Act", f"{gw}_ECN") for gw in GATEWAYS)
+
+# save_data statements, written once (sqlite3's statement cache is keyed on the SQL text)
+SQL_UPSERT_PROJECT = """
+    INSERT INTO projects (id, name, type) VALUES (?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET name=excluded.name, type=excluded.type
+"""
+SQL_UPSERT_MODULE = """
+    INSERT INTO modules (id, project_id, name, parent_module_id) VALUES (?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET project_id=excluded.project_id, name=excluded.name, parent_module_id=excluded.parent_module_id
+"""
+SQL_UPSERT_PROJECT_GATEWAY = """
+    INSERT INTO gateways (entity_type, entity_id, gateway, plan_date, actual_date) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(entity_type, entity_id, gateway) DO UPDATE SET plan_date=excluded.plan_date, actual_date=excluded.actual_date
+"""
+SQL_UPSERT_MODULE_GATEWAY = """
+    INSERT INTO gateways (entity_type, entity_id, gateway, plan_date, actual_date, ecn) VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(entity_type, entity_id, gateway) DO UPDATE SET plan_date=excluded.plan_date, actual_date=excluded.actual_date, ecn=excluded.ecn
+"""
+SQL_UPSERT_DELIVERABLE = """
+    INSERT INTO project_deliverables (id, project_id, gateway_stage, deliverable_name, status, evidence_link, remarks)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET project_id=excluded.project_id, gateway_stage=excluded.gateway_stage,
+        deliverable_name=excluded.deliverable_name, status=excluded.status,
+        evidence_link=excluded.evidence_link, remarks=excluded.remarks
+"""
+
+_last_id = 0
+
+def new_id():
+    """
+    Returns a unique, increasing integer id for new projects/modules/sub-modules.
+    Same scale as the existing ids (epoch milliseconds), bumped by 1 when called twice in the same ms.
+    """
+    global _last_id
+    _last_id = max(_last_id + 1, time.time_ns() // 1_000_000)
+    return _last_id
+
+def _connect():
+    """
+    Opens DB_FILE with the connection PRAGMAs used everywhere:
+    WAL journal (commits append to the -wal file instead of rewriting a rollback journal; readers don't block the writer),
+    synchronous=NORMAL (safe with WAL: one sync per checkpoint, not per commit), in-memory temp tables,
+    a ~20 MB page cache and memory-mapped reads.
+    Also creates the connection's TEMP tables save_data stages the in-memory ids in.
+    """
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False) # Shared across threads, serialized by _conn_lock
+    conn.executescript(
+        "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA temp_store=MEMORY; "
+        "PRAGMA cache_size=-20000; PRAGMA mmap_size=268435456;"
+        "CREATE TEMP TABLE live_ids (id INTEGER PRIMARY KEY);"
+        "CREATE TEMP TABLE live_gateways (entity_type TEXT, entity_id INTEGER, gateway TEXT,"
+        " PRIMARY KEY (entity_type, entity_id, gateway)) WITHOUT ROWID;"
+    )
+    return conn
+
+_conn = None
+_conn_lock = threading.RLock()
+
+def get_conn():
+    """
+    Process-wide connection (opened lazily with _connect), so SQLite's page cache and the PRAGMA setup
+    survive across reruns and sessions (Streamlit runs every rerun on a fresh thread).
+    Only use it inside a function wrapped with _with_conn_lock.
+    """
+    global _conn
+    with _conn_lock:
+        if _conn is None:
+            _conn = _connect()
+        return _conn
+
+def _close_conn():
+    with _conn_lock:
+        if _conn is not None:
+            _conn.close()
+
+atexit.register(_close_conn)
+
+def _with_conn_lock(func):
+    """Runs `func` holding _conn_lock, so one caller at a time uses the shared connection (and its transaction)."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _conn_lock:
+            return func(*args, **kwargs)
+    return wrapper
+
+@_with_conn_lock
 def init_db():
     """Initializes the database tables."""
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_conn()
     cursor = conn.cursor()
     
-    # Check if table exists, if not create
+    # Check if tables exist, if not create
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS projects (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            type TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS modules (
+            id INTEGER PRIMARY KEY,
+            project_id INTEGER,
+            name TEXT,
+            parent_module_id INTEGER,
+            FOREIGN KEY(project_id) REFERENCES projects(id),
+            FOREIGN KEY(parent_module_id) REFERENCES modules(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS gateways (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity_type TEXT,
+            entity_id INTEGER,
+            gateway TEXT,
+            plan_date TEXT,
+            actual_date TEXT,
+            ecn TEXT
+        )
+    """)
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS project_deliverables (
             id INTEGER PRIMARY KEY,
@@ -27,12 +152,41 @@ def init_db():
             remarks TEXT
         )
     """)
+    
+    # Data version: a counter bumped inside every save_data transaction (single row, id 0)
+    cursor.execute("CREATE TABLE IF NOT EXISTS meta (id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER NOT NULL)")
+    cursor.execute("INSERT OR IGNORE INTO meta (id, version) VALUES (0, 0)")
+    
+    # One gateway row per entity + gateway (conflict target for the UPSERTs in save_data).
+    # One-time migration: older databases were written by DELETE + INSERT, so before the index first exists
+    # drop any duplicates (keep the latest). Once it exists duplicates can't occur and this never runs again.
+    has_gw_index = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_gateways_entity'"
+    ).fetchone()
+    if not has_gw_index:
+        cursor.execute("""
+            DELETE FROM gateways WHERE id NOT IN (
+                SELECT MAX(id) FROM gateways GROUP BY entity_type, entity_id, gateway
+            )
+        """)
+        cursor.execute("CREATE UNIQUE INDEX idx_gateways_entity ON gateways (entity_type, entity_id, gateway)")
+    # Lookup paths for per-project queries (readiness filters deliverables by project + gateway stage)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_modules_parent ON modules (project_id, parent_module_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_delivs_project_stage ON project_deliverables (project_id, gateway_stage, status)")
     conn.commit()
-    conn.close()
 
 # Initialize on module load (safe for app start)
 init_db()
 
+@_with_conn_lock
+def db_version():
+    """
+    Change token for the data: the meta.version counter, bumped in the same transaction as every save_data commit.
+    Used to decide when a session must reload and as a cache key for data derived from the projects.
+    """
+    return get_conn().execute("SELECT version FROM meta WHERE id = 0").fetchone()[0]
+
+@_with_conn_lock
 def load_data():
     """Loads projects from the SQLite database and reconstructs the nested dictionary."""
     if not os.path.exists(DB_FILE):
@@ -40,99 +194,83 @@ def load_data():
 
     projects = []
     try:
-        conn = sqlite3.connect(DB_FILE)
-        conn.row_factory = sqlite3.Row # Access columns by name
+        conn = get_conn()
         cursor = conn.cursor()
         
-        # 1. Fetch Projects
-        cursor.execute("SELECT * FROM projects")
+        # Bulk fetch every table once, then stitch the tree together in memory (no per-row queries)
+        # Explicit column lists, unpacked positionally (plain tuples, no per-row name lookups)
+        # 1. Gateways by (entity_type, entity_id)
+        gateways_by_entity = {}
+        cursor.execute("SELECT entity_type, entity_id, gateway, plan_date, actual_date, ecn FROM gateways")
+        for entity_type, entity_id, gateway, plan_date, actual_date, ecn in cursor.fetchall():
+            gateways_by_entity.setdefault((entity_type, entity_id), []).append((gateway, plan_date, actual_date, ecn))
+        
+        # 2. Modules by (project_id, parent_module_id); top-level modules have parent None
+        modules_by_parent = {}
+        cursor.execute("SELECT id, name, project_id, parent_module_id FROM modules")
+        for module_id, name, project_id, parent_module_id in cursor.fetchall():
+            modules_by_parent.setdefault((project_id, parent_module_id), []).append((module_id, name))
+        
+        # 3. Deliverables by project
+        delivs_by_project = {}
+        try:
+            cursor.execute("SELECT project_id, id, gateway_stage, deliverable_name, status, evidence_link, remarks FROM project_deliverables")
+            for d in cursor.fetchall():
+                delivs_by_project.setdefault(d[0], []).append(d[1:])
+        except Exception as e:
+            pass # Table might not exist yet if mid-migration
+        
+        def module_gateways(module_id):
+            return {gateway: {"p": plan_date, "a": actual_date, "ecn": ecn}
+                    for gateway, plan_date, actual_date, ecn in gateways_by_entity.get(('module', module_id), ())}
+        
+        # 4. Projects
+        cursor.execute("SELECT id, name, type FROM projects")
         projs_db = cursor.fetchall()
         
-        for p_row in projs_db:
+        for project_id, name, project_type in projs_db:
             p = {
-                "id": p_row["id"],
-                "name": p_row["name"],
-                "type": p_row["type"],
-                "gateways": {},
-                "type": p_row["type"],
+                "id": project_id,
+                "name": name,
+                "type": project_type,
                 "gateways": {},
                 "modules": [],
                 "deliverables": []
             }
             
-            # Fetch Project Deliverables
-            try:
-                cursor.execute("SELECT * FROM project_deliverables WHERE project_id=?", (p["id"],))
-                delivs = cursor.fetchall()
-                for d in delivs:
-                    p["deliverables"].append({
-                        "id": d["id"],
-                        "gateway_stage": d["gateway_stage"],
-                        "deliverable_name": d["deliverable_name"],
-                        "status": d["status"],
-                        "evidence_link": d["evidence_link"],
-                        "remarks": d["remarks"]
-                    })
-            except Exception as e:
-                pass # Table might not exist yet if mid-migration
+            # Project Deliverables
+            for d_id, gateway_stage, deliverable_name, status, evidence_link, remarks in delivs_by_project.get(project_id, ()):
+                p["deliverables"].append({
+                    "id": d_id,
+                    "gateway_stage": gateway_stage,
+                    "deliverable_name": deliverable_name,
+                    "status": status,
+                    "evidence_link": evidence_link,
+                    "remarks": remarks
+                })
             
-            # Fetch Project Gateways
-            cursor.execute("SELECT * FROM gateways WHERE entity_type='project' AND entity_id=?", (p["id"],))
-            p_gws = cursor.fetchall()
-            for gw in p_gws:
-                 p["gateways"][gw["gateway"]] = {
-                    "p": gw["plan_date"],
-                    "a": gw["actual_date"] if gw["actual_date"] else ""
+            # Project Gateways
+            for gateway, plan_date, actual_date, _ecn in gateways_by_entity.get(('project', project_id), ()):
+                 p["gateways"][gateway] = {
+                    "p": plan_date,
+                    "a": actual_date if actual_date else ""
                 }
             
-            # 2. Fetch Modules (Top Level)
-            cursor.execute("SELECT * FROM modules WHERE project_id=? AND parent_module_id IS NULL", (p["id"],))
-            mods_db = cursor.fetchall()
-            
-            for m_row in mods_db:
+            # Modules (Top Level) -> Sub-Modules
+            for module_id, module_name in modules_by_parent.get((project_id, None), ()):
                 m = {
-                    "id": m_row["id"],
-                    "name": m_row["name"],
-                    "gateways": {},
-                    "sub_modules": []
+                    "id": module_id,
+                    "name": module_name,
+                    "gateways": module_gateways(module_id),
+                    "sub_modules": [
+                        {"id": sub_id, "name": sub_name, "gateways": module_gateways(sub_id)}
+                        for sub_id, sub_name in modules_by_parent.get((project_id, module_id), ())
+                    ]
                 }
-                
-                # Fetch Module Gateways
-                cursor.execute("SELECT * FROM gateways WHERE entity_type='module' AND entity_id=?", (m["id"],))
-                m_gws = cursor.fetchall()
-                for gw in m_gws:
-                    m["gateways"][gw["gateway"]] = {
-                        "p": gw["plan_date"],
-                        "a": gw["actual_date"],
-                        "ecn": gw["ecn"]
-                    }
-                
-                # 3. Fetch Sub-Modules
-                cursor.execute("SELECT * FROM modules WHERE project_id=? AND parent_module_id=?", (p["id"], m["id"]))
-                subs_db = cursor.fetchall()
-                for s_row in subs_db:
-                    s = {
-                        "id": s_row["id"],
-                        "name": s_row["name"],
-                        "gateways": {}
-                    }
-                    # Fetch Sub-Module Gateways
-                    cursor.execute("SELECT * FROM gateways WHERE entity_type='module' AND entity_id=?", (s["id"],))
-                    s_gws = cursor.fetchall()
-                    for gw in s_gws:
-                        s["gateways"][gw["gateway"]] = {
-                            "p": gw["plan_date"],
-                            "a": gw["actual_date"],
-                            "ecn": gw["ecn"]
-                        }
-                    m["sub_modules"].append(s)
-                
                 p["modules"].append(m)
             
             projects.append(p)
             
-        conn.close()
-        
         # Ensure Rollups are calculated on Load to guarantee consistency
         calculate_rollup(projects)
         
@@ -141,76 +279,84 @@ def load_data():
         print(f"Error loading data from DB: {e}")
         return []
 
-def save_data(projects):
-    """Saves projects to the SQLite database (Full Sync)."""
+def _delete_missing(cursor, table, live_ids):
+    """Deletes the rows of `table` whose id is no longer in memory (ids staged in temp.live_ids, diffed in SQL)."""
+    cursor.execute("DELETE FROM temp.live_ids")
+    cursor.executemany("INSERT OR IGNORE INTO temp.live_ids (id) VALUES (?)", live_ids)
+    cursor.execute(f"DELETE FROM {table} WHERE id NOT IN (SELECT id FROM temp.live_ids)")
+
+@_with_conn_lock
+def save_data(projects, dirty=None):
+    """
+    Saves projects to the SQLite database (Full Sync).
+    Rows are UPSERTed in place and only rows no longer in memory are deleted, so an edit rewrites
+    just the pages it touches instead of every table.
+    dirty: optional ids of the edited projects, passed to calculate_rollup (None rolls up everything).
+    """
     try:
         # Pre-calculation Rollup
-        calculate_rollup(projects)
+        calculate_rollup(projects, dirty)
 
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        # Transaction: Delete All -> Insert All
-        # This ensures we match the in-memory state exactly
-        cursor.execute("DELETE FROM gateways")
-        cursor.execute("DELETE FROM modules")
-        cursor.execute("DELETE FROM gateways")
-        cursor.execute("DELETE FROM modules")
-        cursor.execute("DELETE FROM projects")
-        cursor.execute("DELETE FROM project_deliverables")
-        
+        # Walk the tree once into row lists (no DB calls inside the loop)
+        proj_rows, module_rows, proj_gw_rows, module_gw_rows, deliv_rows = [], [], [], [], []
         for p in projects:
-            cursor.execute("INSERT INTO projects (id, name, type) VALUES (?, ?, ?)", 
-                           (p['id'], p['name'], p.get('type', '')))
+            proj_rows.append((p['id'], p['name'], p.get('type', '')))
             
             # Project Gateways
             for gw, data in p.get('gateways', {}).items():
                 if isinstance(data, dict):
-                     cursor.execute("INSERT INTO gateways (entity_type, entity_id, gateway, plan_date, actual_date) VALUES (?, ?, ?, ?, ?)",
-                                   ('project', p['id'], gw, data.get('p', ''), data.get('a', '')))
+                     proj_gw_rows.append(('project', p['id'], gw, data.get('p', ''), data.get('a', '')))
                 else: 
                      # Fallback for old structure if any runtime obj somehow missed rollup
-                     cursor.execute("INSERT INTO gateways (entity_type, entity_id, gateway, plan_date) VALUES (?, ?, ?, ?)",
-                                   ('project', p['id'], gw, data))
+                     proj_gw_rows.append(('project', p['id'], gw, data, None))
             
-            if 'modules' in p:
-                for m in p['modules']:
-                    cursor.execute("INSERT INTO modules (id, project_id, name) VALUES (?, ?, ?)",
-                                   (m['id'], p['id'], m['name']))
-                    
-                    # Module Gateways
-                    for gw, data in m.get('gateways', {}).items():
-                        if isinstance(data, dict):
-                            cursor.execute("INSERT INTO gateways (entity_type, entity_id, gateway, plan_date, actual_date, ecn) VALUES (?, ?, ?, ?, ?, ?)",
-                                           ('module', m['id'], gw, data.get('p', ''), data.get('a', ''), data.get('ecn', '')))
-                    
-                    if 'sub_modules' in m:
-                        for s in m['sub_modules']:
-                            cursor.execute("INSERT INTO modules (id, project_id, name, parent_module_id) VALUES (?, ?, ?, ?)",
-                                           (s['id'], p['id'], s['name'], m['id']))
-                            
-                            for gw, data in s.get('gateways', {}).items():
-                                if isinstance(data, dict):
-                                    cursor.execute("INSERT INTO gateways (entity_type, entity_id, gateway, plan_date, actual_date, ecn) VALUES (?, ?, ?, ?, ?, ?)",
-                                                   ('module', s['id'], gw, data.get('p', ''), data.get('a', ''), data.get('ecn', '')))
+            for m in p.get('modules', []):
+                module_rows.append((m['id'], p['id'], m['name'], None))
+                # Module Gateways
+                module_gw_rows += [('module', m['id'], gw, data.get('p', ''), data.get('a', ''), data.get('ecn', ''))
+                                   for gw, data in m.get('gateways', {}).items() if isinstance(data, dict)]
+                
+                for s in m.get('sub_modules', []):
+                    module_rows.append((s['id'], p['id'], s['name'], m['id']))
+                    module_gw_rows += [('module', s['id'], gw, data.get('p', ''), data.get('a', ''), data.get('ecn', ''))
+                                       for gw, data in s.get('gateways', {}).items() if isinstance(data, dict)]
             
             # Project Deliverables
-            if 'deliverables' in p:
-                for d in p['deliverables']:
-                    cursor.execute("""
-                        INSERT INTO project_deliverables (id, project_id, gateway_stage, deliverable_name, status, evidence_link, remarks)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (d.get('id'), p['id'], d.get('gateway_stage'), d.get('deliverable_name'), d.get('status', 'Pending'), d.get('evidence_link', ''), d.get('remarks', '')))
+            deliv_rows += [(d.get('id'), p['id'], d.get('gateway_stage'), d.get('deliverable_name'), d.get('status', 'Pending'), d.get('evidence_link', ''), d.get('remarks', ''))
+                           for d in p.get('deliverables', [])]
+        
+        conn = get_conn()
+        cursor = conn.cursor()
+        cursor.execute("BEGIN") # One transaction (one journal sync) for the whole save
+        cursor.execute("UPDATE meta SET version = version + 1 WHERE id = 0") # Commits (or rolls back) with the data
+        
+        # Delete what is gone first; deliverables without an id get a fresh rowid below and must survive
+        _delete_missing(cursor, "projects", [row[:1] for row in proj_rows])
+        _delete_missing(cursor, "modules", [row[:1] for row in module_rows])
+        _delete_missing(cursor, "project_deliverables", [row[:1] for row in deliv_rows if row[0] is not None])
+        cursor.execute("DELETE FROM temp.live_gateways")
+        cursor.executemany("INSERT OR IGNORE INTO temp.live_gateways VALUES (?, ?, ?)", [row[:3] for row in proj_gw_rows])
+        cursor.executemany("INSERT OR IGNORE INTO temp.live_gateways VALUES (?, ?, ?)", [row[:3] for row in module_gw_rows])
+        cursor.execute("""
+            DELETE FROM gateways WHERE (entity_type, entity_id, gateway) NOT IN (
+                SELECT entity_type, entity_id, gateway FROM temp.live_gateways
+            )
+        """)
+        
+        cursor.executemany(SQL_UPSERT_PROJECT, proj_rows)
+        cursor.executemany(SQL_UPSERT_MODULE, module_rows)
+        cursor.executemany(SQL_UPSERT_PROJECT_GATEWAY, proj_gw_rows)
+        cursor.executemany(SQL_UPSERT_MODULE_GATEWAY, module_gw_rows)
+        cursor.executemany(SQL_UPSERT_DELIVERABLE, deliv_rows)
         
         conn.commit()
-        conn.close()
         return True
     except Exception as e:
         print(f"Error saving data to DB: {e}")
-    except Exception as e:
-        print(f"Error saving data to DB: {e}")
+        get_conn().rollback() # Shared connection: don't leave the failed transaction open
         return False
 
+@_with_conn_lock
 def backup_database():
     """
     Creates a timestamped backup of the database and maintains only the 30 most recent backups.
@@ -226,11 +372,19 @@ def backup_database():
     backup_path = os.path.join(BACKUP_DIR, backup_filename)
     
     try:
-        shutil.copy2(DB_FILE, backup_path)
+        # Online backup API: copies a consistent snapshot through SQLite (includes pages still in the WAL)
+        dst = sqlite3.connect(backup_path)
+        with dst:
+            get_conn().backup(dst, pages=1000)
+        dst.close()
         print(f"Backup created: {backup_filename}")
         
-        # Housekeeping: Keep only last 30
-        backups = sorted(glob.glob(os.path.join(BACKUP_DIR, "backup_*.db")), key=os.path.getmtime)
+        # Housekeeping: Keep only last 30 (one scandir pass, one stat per file)
+        with os.scandir(BACKUP_DIR) as entries:
+            backups = [entry.path for entry in sorted(
+                (e for e in entries if e.name.startswith("backup_") and e.name.endswith(".db")),
+                key=lambda e: e.stat().st_mtime
+            )]
         while len(backups) > 30:
             oldest = backups.pop(0)
             os.remove(oldest)
@@ -241,10 +395,37 @@ def backup_database():
         print(f"Backup failed: {e}")
         return False
 
+@functools.lru_cache(maxsize=8192)
+def parse_iso(date_str):
+    """
+    Parses a 'YYYY-MM-DD' string into a date (None if blank).
+    Cached: gateway dates come from a small set of strings shared across projects/modules.
+    Canonical 'YYYY-MM-DD' strings use date.fromisoformat (C fast path, no format-string parsing);
+    anything else goes through strptime, so e.g. '2024-1-5' is accepted and '20240105' rejected as before.
+    Raises ValueError for malformed strings (not cached).
+    """
+    if not date_str:
+        return None
+    if len(date_str) == 10 and date_str[4] == date_str[7] == '-':
+        try:
+            return date.fromisoformat(date_str)
+        except ValueError:
+            pass
+    return datetime.strptime(date_str, "%Y-%m-%d").date()
+
+def iso_date_str(date_str):
+    """Canonical 'YYYY-MM-DD' form of a date string ('2024-1-5' -> '2024-01-05'); unparseable strings are returned unchanged."""
+    try:
+        return parse_iso(date_str).isoformat()
+    except ValueError:
+        return date_str
+
+@functools.lru_cache(maxsize=8192)
 def get_status(plan, actual):
     """
     Calculates status based on Plan vs Actual dates.
     Returns: 'green', 'yellow', 'red', 'grey'
+    Cached: the same (plan, actual) pairs repeat across modules/sub-modules of a project.
     Logic:
     - No plan or no actual: grey (Pending)
     - Actual <= Plan: green (On Track)
@@ -255,14 +436,14 @@ def get_status(plan, actual):
         return 'grey'
     
     try:
-        p_date = datetime.strptime(plan, "%Y-%m-%d")
-        a_date = datetime.strptime(actual, "%Y-%m-%d")
+        p_date = parse_iso(plan)
+        a_date = parse_iso(actual)
         
         diff = (a_date - p_date).days
         
         if diff <= 0:
             return 'green'
-        elif diff <= 30:
+        elif diff <= RISK_THRESHOLD_DAYS:
             return 'yellow'
         else:
             return 'red'
@@ -287,9 +468,7 @@ def calculate_dashboard_stats(projects):
         
         p_status = 'green'
         
-        p_status = 'green'
-        
-        gw_keys = ['D0', 'D1', 'D2', 'D3', 'D4']
+        gw_keys = GATEWAYS
         
         # Find the latest gateway that has been "released" (has actuals)
         latest_released_gw = None
@@ -324,60 +503,169 @@ def calculate_dashboard_stats(projects):
         "red": red
     }
 
-def calculate_rollup(projects):
+def _to_datetime64(date_strs):
+    """Parses a list of 'YYYY-MM-DD' strings into a datetime64[D] array (NaT for blank/invalid)."""
+    parsed = pd.to_datetime(pd.Series(date_strs, dtype=object), format="%Y-%m-%d", errors='coerce')
+    return parsed.to_numpy().astype('datetime64[D]')
+
+def _project_plans(projects):
+    """Project Plan dates as a (n_projects, 5) datetime64[D] matrix, parsed once per project."""
+    return _to_datetime64(
+        [p['gateways'].get(gw, {}).get('p') for p in projects for gw in GATEWAYS]
+    ).reshape(len(projects), len(GATEWAYS))
+
+def flatten_gateways(projects, proj_plans=None):
+    """
+    Flattens Project Plan vs Module Actual dates into parallel NumPy arrays.
+    One entry per (project, module, gateway), gateways in D0..D4 order.
+    Project Plans are parsed once per project (or taken from `proj_plans`) and broadcast to its modules.
+    Returns: (plan_arr, actual_arr, proj_idx, mod_idx)
+    - plan_arr / actual_arr: datetime64[D] (NaT where missing)
+    - proj_idx / mod_idx: index into `projects` / into that project's 'modules'
+    """
+    if proj_plans is None:
+        proj_plans = _project_plans(projects)
+    
+    actuals = []
+    mod_proj = []
+    mod_idx = []
+    
+    for pi, p in enumerate(projects):
+        for mi, m in enumerate(p.get('modules', [])):
+            m_gws = m['gateways']
+            actuals.extend(m_gws.get(gw, {}).get('a') for gw in GATEWAYS)
+            mod_proj.append(pi)
+            mod_idx.append(mi)
+    
+    mod_proj = np.array(mod_proj, dtype=np.intp)
+    return (
+        proj_plans[mod_proj].ravel(),
+        _to_datetime64(actuals),
+        np.repeat(mod_proj, len(GATEWAYS)),
+        np.repeat(np.array(mod_idx, dtype=np.intp), len(GATEWAYS))
+    )
+
+def build_gateway_frames(projects):
+    """
+    Reshapes the nested project list into flat DataFrames (AoS -> SoA) for vectorized analytics.
+    Returns: (projects_df, gw_df)
+    - projects_df: id, name, type, plan_D0..plan_D4 (one row per project, same order as `projects`)
+    - gw_df: project_idx, project_id, module_id, gateway, plan, actual, has_plan, has_actual
+      (one row per project/module/gateway)
+      project_idx = row position in projects_df (for bincount-style grouping)
+      plan = Project Plan, actual = Module Actual, both datetime64 (NaT where missing or unparseable)
+      has_plan / has_actual = the date string is non-empty (an unparseable date still counts as entered)
+    """
+    projects_df = pd.DataFrame(
+        [(p['id'], p['name'], p.get('type')) for p in projects],
+        columns=['id', 'name', 'type']
+    )
+    proj_plans = _project_plans(projects)
+    for gi, gw in enumerate(GATEWAYS):
+        projects_df[f'plan_{gw}'] = proj_plans[:, gi]
+    
+    plan_arr, actual_arr, proj_idx, mod_idx = flatten_gateways(projects, proj_plans)
+    proj_has_plan = np.array(
+        [bool(p['gateways'].get(gw, {}).get('p')) for p in projects for gw in GATEWAYS], dtype=bool
+    ).reshape(len(projects), len(GATEWAYS))
+    gw_df = pd.DataFrame({
+        'project_idx': proj_idx,
+        'project_id': projects_df['id'].to_numpy()[proj_idx],
+        'module_id': [projects[pi]['modules'][mi]['id'] for pi, mi in zip(proj_idx, mod_idx)],
+        'gateway': [GATEWAYS[i % len(GATEWAYS)] for i in range(len(plan_arr))],
+        'plan': plan_arr,
+        'actual': actual_arr,
+        'has_plan': proj_has_plan[proj_idx[::len(GATEWAYS)]].ravel(),
+        'has_actual': np.array(
+            [bool(m['gateways'].get(gw, {}).get('a')) for p in projects for m in p.get('modules', []) for gw in GATEWAYS],
+            dtype=bool
+        )
+    })
+    
+    return projects_df, gw_df
+
+def delay_days(plan_arr, actual_arr):
+    """Actual - Plan in days as float array (NaN where either date is missing)."""
+    return (actual_arr - plan_arr) / np.timedelta64(1, 'D')
+
+def classify_status(plan_arr, actual_arr):
+    """
+    Vectorized get_status for datetime64 arrays.
+    Returns int8 codes indexing STATUS_NAMES: 0 green, 1 yellow, 2 red, 3 grey (Plan or Actual missing).
+    """
+    delay = delay_days(plan_arr, actual_arr)
+    return np.select(
+        [np.isnan(delay), delay <= 0, delay <= RISK_THRESHOLD_DAYS],
+        [3, 0, 1],
+        default=2
+    ).astype(np.int8)
+
+def bucket_delays(delay, project_idx, n_projects):
+    """
+    Counts gateways per project into status buckets in a single pass.
+    Returns an (n_projects, 3) int array: [:, 0] Green (<= 0), [:, 1] Yellow (1-30), [:, 2] Red (> 30).
+    NaN delays (missing Plan or Actual) are skipped.
+    """
+    has_both = ~np.isnan(delay)
+    status = np.searchsorted(np.array([0, RISK_THRESHOLD_DAYS]), delay[has_both])
+    return np.bincount(
+        status + 3 * project_idx[has_both], minlength=3 * n_projects
+    ).reshape(n_projects, 3)
+
+def latest_actuals(nodes):
+    """
+    Latest Actual date per gateway across `nodes` (modules or sub-modules) in a single pass.
+    ISO 'YYYY-MM-DD' strings sort chronologically, so no parsing is needed.
+    Returns: {gw: 'YYYY-MM-DD' or ''}
+    """
+    latest = dict.fromkeys(GATEWAYS, "")
+    for n in nodes:
+        n_gws = n['gateways']
+        for gw in GATEWAYS:
+            a = n_gws.get(gw, {}).get('a')
+            if a and a > latest[gw]:
+                latest[gw] = a
+    return latest
+
+def calculate_rollup(projects, dirty=None):
     """
     Performs Bottom-Up Date Rollup:
     1. Module Actual = Max(Sub-Module Actuals)
     2. Project Actual = Max(Module Actuals)
     Updates 'projects' in-place.
+    Each level is one latest_actuals() pass over its children (all gateways at once) instead of one pass per gateway.
+    dirty: optional ids of the projects that were edited; the rest are skipped. None recomputes every project.
     """
     for p in projects:
-        # 1. Rollup Sub-Modules to Modules
-        if 'modules' in p:
-            for m in p['modules']:
-                 # Only if sub-modules exist
-                if m.get('sub_modules'):
-                    for gw in ['D0', 'D1', 'D2', 'D3', 'D4']:
-                        max_date = None
-                        for s in m['sub_modules']:
-                            s_act = s['gateways'].get(gw, {}).get('a')
-                            if s_act:
-                                if max_date is None or s_act > max_date:
-                                    max_date = s_act
-                        
-                        # Update Module Actual if valid max found
-                        if max_date:
-                            if gw not in m['gateways']: m['gateways'][gw] = {'p':'', 'a':'', 'ecn':''}
-                            m['gateways'][gw]['a'] = max_date
-                        else:
-                            # If sub-modules exist but have no actuals, current Module Actual should be cleared
-                            # This enforces strict rollup
-                            if gw in m['gateways']:
-                                m['gateways'][gw]['a'] = ""
+        if 'modules' not in p or (dirty is not None and p['id'] not in dirty):
+            continue
+        
+        # 1. Rollup Sub-Modules to Modules (only if sub-modules exist)
+        for m in p['modules']:
+            if m.get('sub_modules'):
+                for gw, max_date in latest_actuals(m['sub_modules']).items():
+                    # Update Module Actual if valid max found
+                    if max_date:
+                        m['gateways'].setdefault(gw, {'p':'', 'a':'', 'ecn':''})['a'] = max_date
+                    elif gw in m['gateways']:
+                        # If sub-modules exist but have no actuals, current Module Actual should be cleared
+                        # This enforces strict rollup
+                        m['gateways'][gw]['a'] = ""
         
         # 2. Rollup Modules to Project
-        if 'modules' in p:
-            for gw in ['D0', 'D1', 'D2', 'D3', 'D4']:
-                max_date = None
-                for m in p['modules']:
-                    m_act = m['gateways'].get(gw, {}).get('a')
-                    if m_act:
-                        if max_date is None or m_act > max_date:
-                            max_date = m_act
+        for gw, max_date in latest_actuals(p['modules']).items():
+            # Update Project Actual
+            if max_date:
+                if gw not in p['gateways']: 
+                    p['gateways'][gw] = {'p':'', 'a':''}
+                # Ensure p['gateways'][gw] is dict (handled by load_data now)
+                if isinstance(p['gateways'][gw], str): # Handle legacy if not loaded via new load_data yet
+                     p['gateways'][gw] = {'p': p['gateways'][gw], 'a': ''}
                 
-                # Update Project Actual
-                if max_date:
-                    if gw not in p['gateways']: 
-                        p['gateways'][gw] = {'p':'', 'a':''}
-                    # Ensure p['gateways'][gw] is dict (handled by load_data now)
-                    if isinstance(p['gateways'][gw], str): # Handle legacy if not loaded via new load_data yet
-                         p['gateways'][gw] = {'p': p['gateways'][gw], 'a': ''}
-                    
-                    p['gateways'][gw]['a'] = max_date
-                else:
-                    # If modules exist but all are empty, clear Project Actual
-                    if gw in p['gateways'] and isinstance(p['gateways'][gw], dict):
-                        p['gateways'][gw]['a'] = ""
+                p['gateways'][gw]['a'] = max_date
+            elif gw in p['gateways'] and isinstance(p['gateways'][gw], dict):
+                # If modules exist but all are empty, clear Project Actual
+                p['gateways'][gw]['a'] = ""
 
 def prepare_gantt_data(projects):
     """Prepares data for Plotly Gantt chart."""
@@ -436,244 +724,169 @@ def calculate_project_readiness(project_id):
        
     Returns: (score_float, summary_string)
     """
-    score = 0.0
-    summary = "0/0 Items"
+    return calculate_readiness_batch([project_id])[project_id]
+
+@_with_conn_lock
+def calculate_readiness_batch(project_ids):
+    """
+    Batched version of calculate_project_readiness for many projects.
+    Same aggregate query, grouped by project: active stages per project -> applicable deliverables -> counts.
+    Returns: {project_id: (score_float, summary_string)}
+    """
+    results = {pid: (0.0, "0/0 Items") for pid in project_ids}
+    if not results:
+        return results
     
     try:
-        conn = sqlite3.connect(DB_FILE)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # 1. Identify Active Gateways
-        # Fetch gateway actuals for this project
-        cursor.execute("SELECT gateway, actual_date FROM gateways WHERE entity_type='project' AND entity_id=?", (project_id,))
-        rows = cursor.fetchall()
-        
-        active_stages = ['D0'] # Default start
-        
-        # Check actual dates
-        # Map: D0->D0, D1->D1 ...
-        # If D0 actual exists, it's already in (set logic handles dupes or simply checks)
-        # Actually logic is: if actual exists for a stage, that stage's deliverables are applicable.
-        
-        # Create map of existing actuals
-        actuals_map = {row['gateway']: row['actual_date'] for row in rows if row['actual_date']}
-        
-        for gw in ['D0', 'D1', 'D2', 'D3', 'D4']:
-            if gw in actuals_map and actuals_map[gw]:
-                if gw not in active_stages:
-                    active_stages.append(gw)
-                    
-        # 2. Filter Deliverables
-        if not active_stages:
-             active_stages = ['D0']
-             
-        # Build query safely
-        placeholders = ','.join(['?'] * len(active_stages))
-        query = f"SELECT status FROM project_deliverables WHERE project_id=? AND gateway_stage IN ({placeholders})"
-        params = [project_id] + active_stages
-        
-        cursor.execute(query, params)
-        delivs = cursor.fetchall()
-        
-        total_items = len(delivs)
-        achieved_items = 0
-        
-        for d in delivs:
-            if d['status'] in ['Completed', 'NA', 'N/A']: # Handle variation just in case
-                achieved_items += 1
-                
-        if total_items > 0:
-            score = (achieved_items / total_items) * 100
-        else:
-            score = 0.0
-            
-        summary = f"{achieved_items}/{total_items} Items"
+        ids = list(results)
+        placeholders = ','.join(['?'] * len(ids))
+        rows = get_conn().execute(f"""
+            WITH active AS (
+                SELECT entity_id AS project_id, gateway FROM gateways
+                WHERE entity_type='project' AND entity_id IN ({placeholders}) AND IFNULL(actual_date, '') <> ''
+                UNION SELECT project_id, 'D0' FROM project_deliverables WHERE project_id IN ({placeholders})
+            )
+            SELECT d.project_id, IFNULL(SUM(d.status IN ('Completed', 'NA', 'N/A')), 0), COUNT(*)
+            FROM project_deliverables d
+            JOIN active a ON a.project_id = d.project_id AND a.gateway = d.gateway_stage
+            GROUP BY d.project_id
+        """, ids + ids)
         
-        conn.close()
-        return score, summary
+        for pid, achieved_items, total_items in rows:
+            results[pid] = ((achieved_items / total_items) * 100, f"{achieved_items}/{total_items} Items")
+        return results
         
     except Exception as e:
         print(f"Error calculating readiness: {e}")
-        return 0.0, "Error"
+        return {pid: (0.0, "Error") for pid in project_ids}
+
+@functools.lru_cache(maxsize=8)
+def _standard_deliverables(project_type, checklist_mtime):
+    """
+    (gateway, deliverable) pairs from the Master Checklist for a project type.
+    Cached per type; checklist_mtime pins the entry to the file version, so an edited CSV is re-read.
+    """
+    df = pd.read_csv(CHECKLIST_CSV)
+    # Filter based on type
+    # Column names expected: Gateway, Delivarables, Major, Minor
+    
+    # Normalize column names to be safe
+    df.columns = df.columns.str.strip()
+    
+    if project_type == 'Major':
+        filtered_df = df[df['Major'].str.upper() == 'YES']
+    elif project_type == 'Minor':
+        filtered_df = df[df['Minor'].str.upper() == 'YES']
+    else:
+        # Default or Carryover? Maybe assumes same as Minor or None?
+        # User instructions "If Major... If Minor...".
+        # Let's assume defaulting to all or none? "Carryover" usually has minimal.
+        # Returning empty for other types for now unless user specifies.
+        return ()
+    
+    filtered_df = filtered_df.reindex(columns=['Gateway', 'Delivarables'], fill_value='') # Using user's spelling
+    return tuple(zip(filtered_df['Gateway'], filtered_df['Delivarables']))
 
 def populate_deliverables(project_id, project_type):
     """
     Generates a list of deliverables based on the Master Checklist CSV.
     """
-    csv_path = os.path.join(os.path.dirname(__file__), 'master_gateway_checklist.csv')
-    if not os.path.exists(csv_path):
+    if not os.path.exists(CHECKLIST_CSV):
         return []
 
     try:
-        df = pd.read_csv(csv_path)
-        # Filter based on type
-        # Column names expected: Gateway, Delivarables, Major, Minor
-        
-        # Normalize column names to be safe
-        df.columns = df.columns.str.strip()
-        
-        filtered_df = pd.DataFrame()
-        
-        if project_type == 'Major':
-            filtered_df = df[df['Major'].str.upper() == 'YES']
-        elif project_type == 'Minor':
-            filtered_df = df[df['Minor'].str.upper() == 'YES']
-        else:
-            # Default or Carryover? Maybe assumes same as Minor or None?
-            # User instructions "If Major... If Minor...".
-            # Let's assume defaulting to all or none? "Carryover" usually has minimal.
-            # Returning empty for other types for now unless user specifies.
-            return []
-            
-        deliverables = []
-        for _, row in filtered_df.iterrows():
-            deliverables.append({
-                "id": int(datetime.now().timestamp() * 1000) + random.randint(0, 9999),
-                "gateway_stage": row.get('Gateway', ''),
-                "deliverable_name": row.get('Delivarables', ''), # Using user's spelling
-                "status": "Pending",
-                "evidence_link": "",
-                "remarks": ""
-            })
-            
-        return deliverables
+        template = _standard_deliverables(project_type, os.path.getmtime(CHECKLIST_CSV))
+        return [{
+            "id": new_id(),
+            "gateway_stage": gateway,
+            "deliverable_name": name,
+            "status": "Pending",
+            "evidence_link": "",
+            "remarks": ""
+        } for gateway, name in template]
             
     except Exception as e:
         print(f"Error populating deliverables: {e}")
         return []
 
-def projects_to_csv(projects):
-    """Converts the nested project list into a flattened CSV string."""
-    flat_data = []
-    
+def _export_columns(projects):
+    """
+    Export header: key columns first, then Project Plans, then Module Actual/ECN per gateway.
+    Module columns only appear when at least one project has modules.
+    """
+    with_modules = any(p.get('modules') for p in projects)
+    cols = ["Project Name", "Type"]
+    if with_modules:
+        cols += ["Module Name", "Parent Module"]
+    cols += [f"P_{gw}" for gw in GATEWAYS]
+    if with_modules:
+        cols += [f"{gw}_{field}" for gw in GATEWAYS for field in ("Act", "ECN")]
+    return cols, with_modules
+
+def _iter_flat_rows(projects, with_modules):
+    """
+    Yields one export row (tuple in _export_columns order) per module / sub-module,
+    or a single project row when a project has no modules. Missing cells are None.
+    """
     for p in projects:
         # Base project data
-        base_row = {
-            "Project ID": p['id'],
-            "Project Name": p['name'],
-            "Type": p.get('type', ''),
-            "P_D0": p['gateways'].get('D0', {}).get('p', ''),
-            "P_D1": p['gateways'].get('D1', {}).get('p', ''),
-            "P_D2": p['gateways'].get('D2', {}).get('p', ''),
-            "P_D3": p['gateways'].get('D3', {}).get('p', ''),
-            "P_D4": p['gateways'].get('D4', {}).get('p', '')
-        }
+        base = (p['name'], p.get('type', ''))
+        plans = tuple(p['gateways'].get(gw, {}).get('p', '') for gw in GATEWAYS)
         
         # 1. Project Level Row? Or just Module Rows?
         # Usually users want 1 row per module.
         # If no modules, add 1 row for project.
-        
         if not p.get('modules'):
-            flat_data.append(base_row)
-        else:
-            for m in p['modules']:
-                row = base_row.copy()
-                row.update({
-                    "Module ID": m['id'],
-                    "Module Name": m['name'],
-                    "Parent Module": "" # For sub-modules
-                })
-                
-                # Module Gateways
-                for gw in ['D0', 'D1', 'D2', 'D3', 'D4']:
-                    g_data = m['gateways'].get(gw, {})
-                    row[f"{gw}_Act"] = g_data.get('a', '')
-                    row[f"{gw}_ECN"] = g_data.get('ecn', '')
-                    
-                flat_data.append(row)
-                
-                # Sub-modules
-                if m.get('sub_modules'):
-                    for s in m['sub_modules']:
-                        s_row = base_row.copy()
-                        s_row.update({
-                            "Module ID": s['id'],
-                            "Module Name": s['name'],
-                            "Parent Module": m['name']
-                        })
-                        for gw in ['D0', 'D1', 'D2', 'D3', 'D4']:
-                            sg_data = s['gateways'].get(gw, {})
-                            s_row[f"{gw}_Act"] = sg_data.get('a', '')
-                            s_row[f"{gw}_ECN"] = sg_data.get('ecn', '')
-                        flat_data.append(s_row)
-
-    if not flat_data:
-        return ""
+            yield base + (None, None) + plans + (None,) * (2 * len(GATEWAYS)) if with_modules else base + plans
+            continue
         
-    df = pd.DataFrame(flat_data)
-    # Reorder columns for logical flow if needed, but dict order is usually preserved in Py3.7+
-    # Ensure key columns come first
-    cols = ["Project Name", "Type", "Module Name", "Parent Module"] + \
-           [c for c in df.columns if c not in ["Project ID", "Project Name", "Type", "Module ID", "Module Name", "Parent Module"]]
-    
-    # Handle missing columns if data is empty
-    existing_cols = [c for c in cols if c in df.columns]
-    
-    return df[existing_cols].to_csv(index=False)
-    return df[existing_cols].to_csv(index=False)
+        for m in p['modules']:
+            # Module Gateways, then Sub-modules
+            for node, parent_name in [(m, "")] + [(s, m['name']) for s in m.get('sub_modules') or []]:
+                gw_cells = []
+                for gw in GATEWAYS:
+                    g_data = node['gateways'].get(gw, {})
+                    gw_cells += (g_data.get('a', ''), g_data.get('ecn', ''))
+                yield base + (node['name'], parent_name) + plans + tuple(gw_cells)
 
-def projects_to_excel(projects):
-    """Converts the nested project list into an Excel byte stream."""
-    import io
-    flat_data = []
+def projects_to_csv(projects):
+    """Converts the nested project list into a flattened CSV string (rows streamed straight into a csv writer)."""
+    cols, with_modules = _export_columns(projects)
+    rows = _iter_flat_rows(projects, with_modules)
+    first = next(rows, None)
+    if first is None:
+        return ""
     
-    for p in projects:
-        base_row = {
-            "Project ID": p['id'],
-            "Project Name": p['name'],
-            "Type": p.get('type', ''),
-            "P_D0": p['gateways'].get('D0', {}).get('p', ''),
-            "P_D1": p['gateways'].get('D1', {}).get('p', ''),
-            "P_D2": p['gateways'].get('D2', {}).get('p', ''),
-            "P_D3": p['gateways'].get('D3', {}).get('p', ''),
-            "P_D4": p['gateways'].get('D4', {}).get('p', '')
-        }
-        
-        if not p.get('modules'):
-            flat_data.append(base_row)
-        else:
-            for m in p['modules']:
-                row = base_row.copy()
-                row.update({
-                    "Module ID": m['id'],
-                    "Module Name": m['name'],
-                    "Parent Module": ""
-                })
-                for gw in ['D0', 'D1', 'D2', 'D3', 'D4']:
-                    g_data = m['gateways'].get(gw, {})
-                    row[f"{gw}_Act"] = g_data.get('a', '')
-                    row[f"{gw}_ECN"] = g_data.get('ecn', '')
-                flat_data.append(row)
-                
-                if m.get('sub_modules'):
-                    for s in m['sub_modules']:
-                        s_row = base_row.copy()
-                        s_row.update({
-                            "Module ID": s['id'],
-                            "Module Name": s['name'],
-                            "Parent Module": m['name']
-                        })
-                        for gw in ['D0', 'D1', 'D2', 'D3', 'D4']:
-                            sg_data = s['gateways'].get(gw, {})
-                            s_row[f"{gw}_Act"] = sg_data.get('a', '')
-                            s_row[f"{gw}_ECN"] = sg_data.get('ecn', '')
-                        flat_data.append(s_row)
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator=os.linesep)
+    writer.writerow(cols)
+    writer.writerow(first)
+    writer.writerows(rows)
+    return output.getvalue()
 
+def projects_to_excel(projects):
+    """
+    Converts the nested project list into an Excel byte stream.
+    Rows are streamed into a write-only openpyxl sheet (no per-cell objects kept in memory).
+    """
     output = io.BytesIO()
-    if flat_data:
-        df = pd.DataFrame(flat_data)
-        cols = ["Project Name", "Type", "Module Name", "Parent Module"] + \
-               [c for c in df.columns if c not in ["Project ID", "Project Name", "Type", "Module ID", "Module Name", "Parent Module"]]
-        existing_cols = [c for c in cols if c in df.columns]
-        
-        # Write to Excel buffer
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df[existing_cols].to_excel(writer, index=False, sheet_name='Status Report')
-    else:
+    cols, with_modules = _export_columns(projects)
+    rows = _iter_flat_rows(projects, with_modules)
+    first = next(rows, None)
+    if first is None:
         # Create empty excel
         pd.DataFrame().to_excel(output, index=False)
-        
+        output.seek(0)
+        return output
+    
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Status Report')
+    ws.append(cols)
+    ws.append(first)
+    for row in rows:
+        ws.append(row)
+    wb.save(output)
+    
     output.seek(0)
     return output
 
@@ -697,31 +910,51 @@ def process_csv_upload(csv_file, current_projects):
     Merges new data with existing projects/modules.
     """
     try:
-        df = pd.read_csv(csv_file)
+        # Read every cell as text: no per-column type inference (and an ECN like '007' is not turned into 7)
+        df = pd.read_csv(csv_file, dtype=object)
         
         # Standardize column names (optional, but good for robustness)
         df.columns = df.columns.str.strip()
+        df = df.fillna("") # Blank cells as "" (no per-cell NaN checks below)
         
-        # Helper to safely get value
-        def get_val(row, col):
-            val = row.get(col)
-            if pd.isna(val) or val == "":
+        # Column positions resolved once (None for a column the file doesn't have); rows are plain tuples
+        col_pos = {col: i for i, col in enumerate(df.columns)}
+        name_i, type_i, module_i, parent_i = (col_pos.get(col) for col in ("Project Name", "Type", "Module Name", "Parent Module"))
+        gw_pos = tuple((gw, col_pos.get(p_col), col_pos.get(a_col), col_pos.get(e_col)) for gw, p_col, a_col, e_col in GATEWAY_COLS)
+        
+        # Helper to safely get value by position ("" for blank cells and missing columns)
+        def get_val(row, i):
+            if i is None:
                 return ""
-            return str(val).strip()
+            val = row[i]
+            return val.strip() if val else ""
 
         # Index existing projects for quick lookup
         proj_map = {p['name']: p for p in current_projects}
+        # Name -> module indexes, built on first use and kept in step with inserts
+        # (setdefault keeps the first module of a duplicated name, like the linear scan did)
+        mod_index = {} # project name -> {module name: module}
+        sub_index = {} # (project name, parent module name) -> {sub-module name: sub-module}
+        
+        def index_by_name(index, key, nodes):
+            names = index.get(key)
+            if names is None:
+                names = index[key] = {}
+                for n in nodes:
+                    names.setdefault(n['name'], n)
+            return names
         
-        for _, row in df.iterrows():
-            p_name = get_val(row, "Project Name")
+        # Plain tuple per row (iterrows would build a Series for every row)
+        for row in df.itertuples(index=False, name=None):
+            p_name = get_val(row, name_i)
             if not p_name: continue # Skip empty rows
             
-            p_type = get_val(row, "Type")
+            p_type = get_val(row, type_i)
             
             # --- Project Handling ---
             if p_name not in proj_map:
                 new_p = {
-                    "id": int(datetime.now().timestamp() * 1000) + random.randint(0, 999),
+                    "id": new_id(),
                     "name": p_name,
                     "type": p_type if p_type else "New",
                     "gateways": {},
@@ -736,18 +969,19 @@ def process_csv_upload(csv_file, current_projects):
             
             # Update Project Gateways (Plan only usually at project level from CSV, but we can support both)
             # Actually, per schema, P_D0... are typically Plan dates.
-            for gw in ['D0', 'D1', 'D2', 'D3', 'D4']:
-                p_date = get_val(row, f"P_{gw}")
+            for gw, p_i, _a_i, _e_i in gw_pos:
+                p_date = get_val(row, p_i)
                 if p_date:
+                    p_date = iso_date_str(p_date) # Stored zero-padded, so string comparisons (rollup) stay chronological
                     if gw not in p['gateways'] or not isinstance(p['gateways'][gw], dict):
                          p['gateways'][gw] = {'p': p_date, 'a': ''}
                     else:
                          p['gateways'][gw]['p'] = p_date
 
             # --- Module Handling ---
-            m_name = get_val(row, "Module Name")
+            m_name = get_val(row, module_i)
             if m_name:
-                parent_m_name = get_val(row, "Parent Module")
+                parent_m_name = get_val(row, parent_i)
                 
                 # Find or Create Module
                 # Hierarchy: Project -> Module -> SubModule
@@ -756,20 +990,28 @@ def process_csv_upload(csv_file, current_projects):
                 is_sub = False
                 
                 # Check if this is a sub-module
+                modules_by_name = mod_index.get(p_name)
+                if modules_by_name is None:
+                    # First module row of this project: every module gets a sub_modules list once, so rows below can rely on it
+                    for m in p['modules']:
+                        m.setdefault('sub_modules', [])
+                    modules_by_name = index_by_name(mod_index, p_name, p['modules'])
                 if parent_m_name:
                     # Find parent first
-                    parent = next((m for m in p['modules'] if m['name'] == parent_m_name), None)
+                    parent = modules_by_name.get(parent_m_name)
                     if parent:
-                        if 'sub_modules' not in parent: parent['sub_modules'] = []
+                        sub_modules = parent['sub_modules']
                         
-                        target_module = next((s for s in parent['sub_modules'] if s['name'] == m_name), None)
+                        subs_by_name = index_by_name(sub_index, (p_name, parent_m_name), sub_modules)
+                        target_module = subs_by_name.get(m_name)
                         if not target_module:
                             target_module = {
-                                "id": int(datetime.now().timestamp() * 1000) + random.randint(0, 999),
+                                "id": new_id(),
                                 "name": m_name,
                                 "gateways": {}
                             }
-                            parent['sub_modules'].append(target_module)
+                            sub_modules.append(target_module)
+                            subs_by_name[m_name] = target_module
                             is_sub = True
                     else:
                         # Fallback: Treat as root module if parent not found? Or Create Parent?
@@ -779,32 +1021,35 @@ def process_csv_upload(csv_file, current_projects):
 
                 if not target_module and not is_sub:
                      # Search top-level modules
-                    target_module = next((m for m in p['modules'] if m['name'] == m_name), None)
+                    target_module = modules_by_name.get(m_name)
                     if not target_module:
                         target_module = {
-                            "id": int(datetime.now().timestamp() * 1000) + random.randint(0, 999),
+                            "id": new_id(),
                             "name": m_name,
                             "gateways": {},
                             "sub_modules": []
                         }
                         p['modules'].append(target_module)
+                        modules_by_name[m_name] = target_module
                 
                 # --- Update Module Gateways ---
                 if target_module:
-                    for gw in ['D0', 'D1', 'D2', 'D3', 'D4']:
-                        # Ensure Gateway dict exists
-                        if gw not in target_module['gateways']: target_module['gateways'][gw] = {}
-                        
-                        p_d = get_val(row, f"P_{gw}") # Plan might come from row, but typically Project Plan is project level.
+                    m_gws = target_module['gateways']
+                    for gw, p_i, a_i, e_i in gw_pos:
+                        p_d = get_val(row, p_i) # Plan might come from row, but typically Project Plan is project level.
                         # If user puts different plans for modules, we could support it, but data structure usually links module plan to project plan?
                         # Actually earlier structure has 'p' in module gateways too.
                         
-                        act_d = get_val(row, f"{gw}_Act")
-                        ecn = get_val(row, f"{gw}_ECN")
+                        act_d = get_val(row, a_i)
+                        ecn = get_val(row, e_i)
+                        if not (p_d or act_d or ecn):
+                            continue # Nothing for this gateway: don't create an empty entry (readers use .get)
+                        
+                        gw_data = m_gws.setdefault(gw, {}) # Ensure Gateway dict exists
                         
-                        if p_d: target_module['gateways'][gw]['p'] = p_d
-                        if act_d: target_module['gateways'][gw]['a'] = act_d
-                        if ecn: target_module['gateways'][gw]['ecn'] = ecn
+                        if p_d: gw_data['p'] = iso_date_str(p_d)
+                        if act_d: gw_data['a'] = iso_date_str(act_d)
+                        if ecn: gw_data['ecn'] = ecn
 
         return current_projects, "Success"
         
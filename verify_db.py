@@ -18,10 +18,13 @@ def test_load():
             print(f"     * {m['name']} (ID: {m['id']})")
             if m.get('sub_modules'):
                 print(f"       Sub-modules: {len(m['sub_modules'])}")
+    return projects
 
-def test_save():
+def test_save(projects):
     print("\nTesting utils.save_data()...")
-    projects = utils.load_data()
+    if os.environ.get('VERIFY_READONLY'):
+        print("VERIFY_READONLY set, skipping save.")
+        return
     if not projects:
         print("No projects to save.")
         return
@@ -43,5 +46,5 @@ if __name__ == "__main__":
     if not os.path.exists(DB_FILE):
         print("DB file not found!")
     else:
-        test_load()
-        test_save()
+        projects = test_load()
+        test_save(projects)